@@ -3,16 +3,63 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException, InvalidSessionIdException
+from concurrent.futures import ThreadPoolExecutor
+import os
+import csv
+import sys
 import time
+import queue
+import argparse
+import threading
+
+BAIDU_URL = "https://www.baidu.com"
+
+# Page elements the search relies on; a local stand-in page only needs to provide these
+SEARCH_BOX_ID = "kw"
+RESULTS_SELECTOR = "#content_left"
+RESULT_TITLE_SELECTOR = "#content_left h3"
+
+# Browser and driver locations come from the command line or these environment
+# variables; when neither is set, Selenium finds Chrome and chromedriver itself
+CHROME_PATH_ENV = "CHROME_PATH"
+CHROMEDRIVER_PATH_ENV = "CHROMEDRIVER_PATH"
+
+# How long a batch worker waits for a free driver before giving up on a keyword
+DRIVER_WAIT_SECONDS = 300
+
+# How often a waiting worker re-checks that the pool still has live drivers
+DRIVER_POLL_SECONDS = 1
+
+RESULT_FIELDS = ["keyword", "title", "url", "results", "seconds", "error"]
+
+def empty_row(keyword):
+    """Result row for a keyword before (or without) a successful search"""
+    return {"keyword": keyword, "title": "", "url": "", "results": "", "seconds": 0.0, "error": ""}
+
+def create_driver(chrome_path=None, driver_path=None, headless=True):
+    """
+    Start a Chrome driver.
+
+    Args:
+        chrome_path (str): Chrome binary (default: $CHROME_PATH or auto-detect)
+        driver_path (str): chromedriver binary (default: $CHROMEDRIVER_PATH or auto-detect)
+        headless (bool): Run without a window (default: True)
+
+    Returns:
+        WebDriver: The started driver
+    """
+    chrome_path = chrome_path or os.environ.get(CHROME_PATH_ENV)
+    driver_path = driver_path or os.environ.get(CHROMEDRIVER_PATH_ENV)
 
-def search_baidu(keyword):
-    # Configurable paths for Chrome and ChromeDriver
-    path_ChromeDriver = "C:/prog/chromedriver/chromedriver-win64/chromedriver.exe"
-    path_Chrome = "C:/prog/chromedriver/chrome-win64/chrome.exe"
-    
     # Set up Chrome options to address sandbox and other issues
     chrome_options = Options()
-    chrome_options.binary_location = path_Chrome
+    if chrome_path:
+        chrome_options.binary_location = chrome_path
+    if headless:
+        chrome_options.add_argument("--headless=new")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--disable-gpu")
@@ -22,45 +69,221 @@ def search_baidu(keyword):
     chrome_options.add_argument("--disable-javascript")  # Disable JS to reduce errors
     chrome_options.add_argument("--disable-web-security")
     chrome_options.add_argument("--mute-audio")
-    
+
     # Create service with ChromeDriver path
-    service = Service(path_ChromeDriver)
-    
+    service = Service(driver_path) if driver_path else Service()
+
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+def search_with_driver(driver, keyword, base_url=BAIDU_URL, timeout=10, max_titles=10):
+    """
+    Search for one keyword with an already running driver.
+
+    Waits for the search box and then for the results container instead of
+    sleeping for fixed times.
+
+    Args:
+        driver (WebDriver): Running driver
+        keyword (str): Search keyword
+        base_url (str): Search page URL (default: Baidu)
+        timeout (float): Seconds to wait for each page (default: 10)
+        max_titles (int): Maximum number of result titles to collect (default: 10)
+
+    Returns:
+        dict: Row with keyword, title, url, results (titles joined by " | "), seconds and error
+    """
+    started = time.monotonic()
+    row = empty_row(keyword)
+    wait = WebDriverWait(driver, timeout)
+
+    driver.get(base_url)
+    search_box = wait.until(EC.element_to_be_clickable((By.ID, SEARCH_BOX_ID)))
+    search_box.clear()
+    search_box.send_keys(keyword)
+    search_box.send_keys(Keys.RETURN)
+
+    # Wait for results to load
+    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, RESULTS_SELECTOR)))
+    titles = [element.text.strip() for element in driver.find_elements(By.CSS_SELECTOR, RESULT_TITLE_SELECTOR)]
+
+    row["title"] = driver.title
+    row["url"] = driver.current_url
+    row["results"] = " | ".join(title for title in titles[:max_titles] if title)
+    row["seconds"] = round(time.monotonic() - started, 3)
+    return row
+
+class DriverPool:
+    """
+    Fixed set of reusable drivers shared by worker threads.
+
+    A driver whose browser session is gone is replaced with a fresh one, so
+    one crashed browser does not fail the rest of the batch; other errors
+    (a missing element, a script error) leave the driver in the pool. Once no driver is left
+    (every restart failed), run() fails immediately instead of waiting.
+    """
+
+    def __init__(self, size, chrome_path=None, driver_path=None, headless=True):
+        self.chrome_path = chrome_path
+        self.driver_path = driver_path
+        self.headless = headless
+        self.drivers = queue.Queue()
+        self.all_drivers = []
+        # Drivers being replaced count as live, so waiting workers do not give up early
+        self.restarting = 0
+        self.lock = threading.Lock()
+        try:
+            for _ in range(size):
+                self._add(create_driver(chrome_path, driver_path, headless))
+        except Exception as e:
+            # Do not leave the browsers that did start running
+            self.close()
+            print(f"Error initializing Chrome driver: {e}")
+            print("Please check your Chrome and ChromeDriver paths")
+            raise
+
+    def _add(self, driver):
+        with self.lock:
+            self.all_drivers.append(driver)
+        self.drivers.put(driver)
+
+    def live_count(self):
+        """Number of drivers in the pool, including ones being restarted"""
+        with self.lock:
+            return len(self.all_drivers) + self.restarting
+
+    def _take(self):
+        """Get a free driver, failing fast once the pool has no live drivers"""
+        deadline = time.monotonic() + DRIVER_WAIT_SECONDS
+        while True:
+            if not self.live_count():
+                raise RuntimeError("No live Chrome drivers left in the pool")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(f"No Chrome driver became free within {DRIVER_WAIT_SECONDS} seconds")
+            try:
+                return self.drivers.get(timeout=min(DRIVER_POLL_SECONDS, remaining))
+            except queue.Empty:
+                continue
+
+    @staticmethod
+    def _session_alive(driver):
+        """Probe whether the driver's browser session still answers"""
+        try:
+            driver.title
+            return True
+        except WebDriverException:
+            return False
+
+    def run(self, func, *args, **kwargs):
+        """Call func(driver, *args, **kwargs) with a driver from the pool"""
+        # Bounded wait, so a batch cannot hang if every browser failed to restart
+        driver = self._take()
+        try:
+            result = func(driver, *args, **kwargs)
+        except TimeoutException:
+            # A slow page does not mean the browser is broken
+            self.drivers.put(driver)
+            raise
+        except WebDriverException as e:
+            if not isinstance(e, InvalidSessionIdException) and self._session_alive(driver):
+                # The page misbehaved, the browser is fine
+                self.drivers.put(driver)
+                raise
+            with self.lock:
+                self.all_drivers.remove(driver)
+                self.restarting += 1
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            try:
+                self._add(create_driver(self.chrome_path, self.driver_path, self.headless))
+            except Exception as e:
+                print(f"Error restarting Chrome driver: {e}")
+            finally:
+                with self.lock:
+                    self.restarting -= 1
+            raise
+        except Exception:
+            self.drivers.put(driver)
+            raise
+        self.drivers.put(driver)
+        return result
+
+    def close(self):
+        with self.lock:
+            drivers, self.all_drivers = self.all_drivers, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+def read_keywords(keyword_file):
+    """Read one keyword per line, skipping blank lines and lines starting with #"""
+    with open(keyword_file, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def batch_search(keywords, pool_size=2, chrome_path=None, driver_path=None, base_url=BAIDU_URL,
+                 timeout=10, headless=True):
+    """
+    Search many keywords with a pool of reusable headless drivers.
+
+    Args:
+        keywords (list): Keywords to search
+        pool_size (int): Number of browsers running in parallel (default: 2)
+        chrome_path (str): Chrome binary (default: $CHROME_PATH or auto-detect)
+        driver_path (str): chromedriver binary (default: $CHROMEDRIVER_PATH or auto-detect)
+        base_url (str): Search page URL, e.g. a local stand-in page (default: Baidu)
+        timeout (float): Seconds to wait for each page (default: 10)
+        headless (bool): Run browsers without a window (default: True)
+
+    Yields:
+        dict: One result row per keyword, in keyword order; if the browsers
+              cannot be started, every row carries that error
+    """
+    try:
+        pool = DriverPool(min(pool_size, len(keywords)) or 1, chrome_path, driver_path, headless)
+    except Exception as e:
+        error = str(e).strip() or type(e).__name__
+        for keyword in keywords:
+            row = empty_row(keyword)
+            row["error"] = error
+            yield row
+        return
+
+    def search_one(keyword):
+        try:
+            return pool.run(search_with_driver, keyword, base_url, timeout)
+        except Exception as e:
+            row = empty_row(keyword)
+            row["error"] = str(e).strip() or type(e).__name__
+            return row
+
+    try:
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            for row in executor.map(search_one, keywords):
+                yield row
+    finally:
+        pool.close()
+
+def search_baidu(keyword, chrome_path=None, driver_path=None, base_url=BAIDU_URL, timeout=10):
     try:
         # Initialize Chrome driver with specified paths and options
-        driver = webdriver.Chrome(service=service, options=chrome_options)
+        driver = create_driver(chrome_path, driver_path, headless=False)
         print("Chrome driver initialized successfully")
     except Exception as e:
         print(f"Error initializing Chrome driver: {e}")
         print("Please check your Chrome and ChromeDriver paths")
         return
-    
+
     try:
-        # Open Baidu website
-        driver.get("https://www.baidu.com")
-        print("Successfully opened Baidu")
-        
-        # Give the page some time to load completely
-        time.sleep(2)
-        
-        # Find the search input field by its ID
-        search_box = driver.find_element(By.ID, "kw")
-        print("Found search box")
-        
-        # Enter the search keyword
-        search_box.send_keys(keyword)
+        row = search_with_driver(driver, keyword, base_url, timeout)
         print(f"Entered keyword: {keyword}")
-        
-        # Submit the search by pressing Enter
-        search_box.send_keys(Keys.RETURN)
-        print("Submitted search")
-        
-        # Wait for results to load
-        time.sleep(5)
-        
+
         # Print the title of the results page
-        print(f"Page title: {driver.title}")
-        
+        print(f"Page title: {row['title']}")
+
     except Exception as e:
         print(f"An error occurred: {e}")
         import traceback
@@ -70,5 +293,47 @@ def search_baidu(keyword):
         driver.quit()
         print("Browser closed")
 
+def main():
+    parser = argparse.ArgumentParser(description="Search Baidu with Selenium, for one keyword or a batch from a file")
+    parser.add_argument("keyword", nargs="?", default="你好", help="Keyword to search (default: 你好)")
+    parser.add_argument("--keywords-file", help="File with one keyword per line; enables batch mode")
+    parser.add_argument("--pool-size", type=int, default=2, help="Number of reusable browsers in batch mode (default: 2)")
+    parser.add_argument("--chrome", help=f"Chrome binary (default: ${CHROME_PATH_ENV} or auto-detect)")
+    parser.add_argument("--chromedriver", help=f"chromedriver binary (default: ${CHROMEDRIVER_PATH_ENV} or auto-detect)")
+    parser.add_argument("--base-url", default=BAIDU_URL, help="Search page URL, e.g. a local stand-in page (default: https://www.baidu.com)")
+    parser.add_argument("--timeout", type=float, default=10, help="Seconds to wait for each page (default: 10)")
+    parser.add_argument("--output", help="Write batch results as CSV to this file (default: stdout)")
+    parser.add_argument("--show-browser", action="store_true", help="Show browser windows in batch mode")
+
+    args = parser.parse_args()
+
+    if args.pool_size < 1:
+        print("Error: --pool-size must be at least 1.")
+        return
+
+    if not args.keywords_file:
+        search_baidu(args.keyword, args.chrome, args.chromedriver, args.base_url, args.timeout)
+        return
+
+    if not os.path.isfile(args.keywords_file):
+        print(f"Error: File '{args.keywords_file}' does not exist.")
+        return
+
+    keywords = read_keywords(args.keywords_file)
+    rows = batch_search(keywords, args.pool_size, args.chrome, args.chromedriver, args.base_url,
+                        args.timeout, headless=not args.show_browser)
+
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(output, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            output.flush()
+    finally:
+        if args.output:
+            output.close()
+            print(f"Results written to: {args.output}")
+
 if __name__ == "__main__":
-    search_baidu("你好")
\ No newline at end of file
+    main()
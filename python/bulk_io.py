@@ -0,0 +1,252 @@
+import io
+import os
+import mmap
+import errno
+import time
+import threading
+from file_filters import parse_size
+
+# I/O modes for bulk reads:
+#   buffered - plain buffered reads (default, what calculate_md5 always did)
+#   fadvise  - buffered reads with POSIX_FADV_SEQUENTIAL readahead, and
+#              POSIX_FADV_DONTNEED for every range already read, so hashing
+#              does not evict other processes' working set from the page cache
+#   direct   - O_DIRECT reads into an aligned buffer, bypassing the page cache
+#              entirely (falls back to fadvise where O_DIRECT is unavailable)
+IO_MODES = ['buffered', 'fadvise', 'direct']
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# O_DIRECT needs buffer address, offset and length aligned to the logical block size
+DIRECT_ALIGNMENT = 4096
+
+# Longest idle time a Throttle carries over as credit for a later burst
+THROTTLE_BURST_SECONDS = 0.25
+
+class Throttle:
+    """
+    Limit read throughput to a number of bytes per second.
+
+    A single Throttle can be shared by several threads; the limit applies to
+    their combined throughput. Idle time (walking, cache hits, gaps between
+    files) earns at most THROTTLE_BURST_SECONDS of credit, so it cannot be
+    spent later as a burst at full disk speed.
+    """
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+        self.consumed = 0
+
+    def consume(self, nbytes):
+        """Account for nbytes just read and sleep long enough to stay under the limit"""
+        if not self.bytes_per_second:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if self.start + self.consumed / self.bytes_per_second < now - THROTTLE_BURST_SECONDS:
+                # Behind schedule after idling: restart the budget with limited credit
+                self.start = now - THROTTLE_BURST_SECONDS
+                self.consumed = 0
+            self.consumed += nbytes
+            due = self.start + self.consumed / self.bytes_per_second
+        delay = due - now
+        if delay > 0:
+            time.sleep(delay)
+
+def has_fadvise():
+    """Return True if posix_fadvise is available on this platform"""
+    return hasattr(os, 'posix_fadvise')
+
+def has_direct_io():
+    """Return True if O_DIRECT is available on this platform"""
+    return hasattr(os, 'O_DIRECT')
+
+def _read_buffered(file_path, chunk_size, throttle):
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            if throttle:
+                throttle.consume(len(chunk))
+            yield chunk
+
+def _read_fadvise(file_path, chunk_size, throttle):
+    with open(file_path, 'rb') as f:
+        fd = f.fileno()
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        offset = 0
+        try:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                # Drop what we have already consumed so large files do not fill the cache either
+                os.posix_fadvise(fd, offset, len(chunk), os.POSIX_FADV_DONTNEED)
+                offset += len(chunk)
+                if throttle:
+                    throttle.consume(len(chunk))
+                yield chunk
+        finally:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+def _read_direct(file_path, chunk_size, throttle):
+    chunk_size = max(DIRECT_ALIGNMENT, chunk_size - chunk_size % DIRECT_ALIGNMENT)
+    fd = os.open(file_path, os.O_RDONLY | os.O_DIRECT)
+    # Anonymous mmap memory is page aligned, which satisfies O_DIRECT
+    buf = mmap.mmap(-1, chunk_size)
+    try:
+        while True:
+            n = os.readv(fd, [buf])
+            if n <= 0:
+                break
+            if throttle:
+                throttle.consume(n)
+            yield buf[:n]
+            if n < chunk_size:
+                break
+    finally:
+        buf.close()
+        os.close(fd)
+
+def read_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE, io_mode='buffered', throttle=None):
+    """
+    Yield the contents of a file in chunks using the requested I/O mode.
+
+    Args:
+        file_path (str): Path to the file
+        chunk_size (int): Bytes per read (default: 4MB)
+        io_mode (str): One of IO_MODES (default: 'buffered')
+        throttle (Throttle): Optional throughput limit (default: None)
+
+    Yields:
+        bytes: Consecutive chunks of the file
+    """
+    if io_mode == 'direct' and has_direct_io():
+        started = False
+        try:
+            for chunk in _read_direct(file_path, chunk_size, throttle):
+                started = True
+                yield chunk
+            return
+        except OSError as e:
+            # Some filesystems (tmpfs, many network mounts) reject O_DIRECT with EINVAL
+            if e.errno != errno.EINVAL or started:
+                raise
+            io_mode = 'fadvise'
+    if io_mode in ('fadvise', 'direct') and has_fadvise():
+        yield from _read_fadvise(file_path, chunk_size, throttle)
+    else:
+        yield from _read_buffered(file_path, chunk_size, throttle)
+
+def read_ranges(file_path, ranges, io_mode='buffered', throttle=None):
+    """
+    Yield (offset, length) ranges of a file, e.g. the windows of a sampled digest.
+
+    Sampled windows are not block aligned, so 'direct' is served like
+    'fadvise': the pages read are dropped from the page cache afterwards.
+
+    Args:
+        file_path (str): Path to the file
+        ranges (iterable): (offset, length) pairs to read, in order
+        io_mode (str): One of IO_MODES (default: 'buffered')
+        throttle (Throttle): Optional throughput limit (default: None)
+
+    Yields:
+        bytes: The data of each range (shorter at end of file)
+    """
+    drop_cache = io_mode in ('fadvise', 'direct') and has_fadvise()
+    with open(file_path, 'rb') as f:
+        try:
+            for offset, length in ranges:
+                f.seek(offset)
+                data = f.read(length)
+                if throttle:
+                    throttle.consume(len(data))
+                yield data
+        finally:
+            if drop_cache:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+class _ManagedRaw(io.RawIOBase):
+    """Raw seekable reader that throttles reads and drops the file from the page cache on close"""
+
+    def __init__(self, file_path, drop_cache, throttle):
+        self.raw = open(file_path, 'rb', buffering=0)
+        self.drop_cache = drop_cache
+        self.throttle = throttle
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = self.raw.readinto(b)
+        if n and self.throttle:
+            self.throttle.consume(n)
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self.raw.seek(offset, whence)
+
+    def tell(self):
+        return self.raw.tell()
+
+    def close(self):
+        if not self.closed:
+            try:
+                if self.drop_cache:
+                    os.posix_fadvise(self.raw.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                self.raw.close()
+        super().close()
+
+def open_managed(file_path, io_mode='buffered', throttle=None):
+    """
+    Open a file for seekable reading (e.g. an archive read by zipfile or
+    tarfile) under an I/O mode and throttle.
+
+    Archive readers seek to unaligned offsets, so 'direct' is served like
+    'fadvise': the file is dropped from the page cache when it is closed.
+
+    Args:
+        file_path (str): Path to the file
+        io_mode (str): One of IO_MODES (default: 'buffered')
+        throttle (Throttle): Optional throughput limit (default: None)
+
+    Returns:
+        file: A binary file object, to be used as a context manager
+    """
+    drop_cache = io_mode in ('fadvise', 'direct') and has_fadvise()
+    if not drop_cache and not throttle:
+        return open(file_path, 'rb')
+    return io.BufferedReader(_ManagedRaw(file_path, drop_cache, throttle), 1024 * 1024)
+
+# Per-process Throttle in worker pools, set up by init_worker_io
+_worker_throttle = None
+
+def init_worker_io(bytes_per_second):
+    """ProcessPoolExecutor initializer giving each worker process its own Throttle"""
+    global _worker_throttle
+    _worker_throttle = Throttle(bytes_per_second) if bytes_per_second else None
+
+def worker_throttle():
+    """The Throttle of the current worker process, or None"""
+    return _worker_throttle
+
+def worker_share(bytes_per_second, workers):
+    """
+    Split a throughput limit between worker processes, which cannot share
+    one Throttle.
+
+    Returns:
+        tuple: (workers, bytes_per_second per worker or None)
+    """
+    workers = workers or os.cpu_count() or 1
+    return workers, (bytes_per_second / workers if bytes_per_second else None)
+
+def add_io_arguments(parser):
+    """Add the shared --io-mode/--throttle options to an argparse parser"""
+    group = parser.add_argument_group("I/O")
+    group.add_argument("--io-mode", choices=IO_MODES, default='buffered',
+                       help="buffered (default), fadvise (keep page cache clean) or direct (O_DIRECT)")
+    group.add_argument("--throttle", type=parse_size, default=None, metavar="BYTES_PER_SEC",
+                       help="Limit read throughput, e.g. 50M for 50MB/s")
@@ -0,0 +1,198 @@
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from bulk_io import read_chunks, init_worker_io, worker_throttle, worker_share
+
+# numpy is optional; it computes the rolling hash for a whole buffer at once,
+# which is what lets chunking keep up with disk throughput. Without it the
+# same boundaries are found byte by byte in pure Python.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+READ_SIZE = 4 * 1024 * 1024
+
+DEFAULT_AVG_CHUNK = 64 * 1024
+
+# Smallest accepted average chunk size; min/max sizes are derived from it and must stay positive
+MIN_AVG_CHUNK = 64
+
+# Gear table: one fixed pseudo-random 32-bit value per byte value. Derived
+# from MD5 so chunk boundaries are identical on every machine and run.
+GEAR = [int.from_bytes(hashlib.md5(bytes([i])).digest()[:4], 'little') for i in range(256)]
+GEAR_NP = numpy.array(GEAR, dtype=numpy.uint32) if numpy is not None else None
+
+# The gear hash shifts left by one per byte, so with 32-bit arithmetic it
+# depends only on the last 32 bytes: boundaries are purely content-defined
+WINDOW = 32
+HASH_MASK = 0xFFFFFFFF
+
+def boundary_mask(avg_size):
+    """Mask over the high hash bits giving one candidate boundary per ~avg_size bytes"""
+    bits = max(1, avg_size.bit_length() - 1)
+    return ((1 << bits) - 1) << (32 - bits)
+
+def _candidates_python(data, offset, state, mask):
+    """Positions (exclusive chunk ends) in data where the rolling hash hits the mask"""
+    h = state[0]
+    gear = GEAR
+    candidates = []
+    position = offset
+    for b in data:
+        h = ((h << 1) + gear[b]) & HASH_MASK
+        position += 1
+        if not h & mask:
+            candidates.append(position)
+    state[0] = h
+    return candidates
+
+def _candidates_numpy(data, offset, state, mask):
+    """Same as _candidates_python, computed for the whole buffer with numpy"""
+    # Prepend the previous WINDOW - 1 bytes so hashes at the buffer start see their full window
+    context = state[1]
+    values = GEAR_NP[numpy.frombuffer(context + data, dtype=numpy.uint8)]
+    # h[i] = sum(values[i - k] << k for k < WINDOW), built by doubling the window: 5 passes instead of 32
+    h = values
+    shifted = numpy.empty_like(h)
+    span = 1
+    while span < WINDOW:
+        shifted[:span] = 0
+        numpy.left_shift(h[:-span], numpy.uint32(span), out=shifted[span:])
+        h += shifted
+        span *= 2
+    hits = numpy.flatnonzero((h[len(context):] & numpy.uint32(mask)) == 0)
+    state[1] = (context + data)[-(WINDOW - 1):]
+    return (hits + (offset + 1)).tolist()
+
+def chunk_file(file_path, avg_size=DEFAULT_AVG_CHUNK, min_size=None, max_size=None, io_mode='buffered', throttle=None):
+    """
+    Split a file into content-defined chunks and hash each one, without
+    holding more than one read buffer in memory.
+
+    Args:
+        file_path (str): Path to the file
+        avg_size (int): Target average chunk size in bytes (default: 64KB)
+        min_size (int): Minimum chunk size (default: avg_size / 4)
+        max_size (int): Maximum chunk size (default: avg_size * 4)
+        io_mode (str): I/O mode, see bulk_io.IO_MODES (default: 'buffered')
+        throttle (Throttle): Optional bytes/s limit (default: None)
+
+    Raises:
+        ValueError: If avg_size is below MIN_AVG_CHUNK
+
+    Returns:
+        tuple: (file_path, chunks) where chunks is a list of (digest, size),
+               or (file_path, None) if the file could not be read
+    """
+    if avg_size < MIN_AVG_CHUNK:
+        raise ValueError(f"average chunk size must be at least {MIN_AVG_CHUNK} bytes")
+    min_size = min_size or avg_size // 4
+    max_size = max_size or avg_size * 4
+    mask = boundary_mask(avg_size)
+    find_candidates = _candidates_numpy if numpy is not None else _candidates_python
+    # [rolling hash, trailing context bytes] carried between read buffers
+    state = [0, b""]
+
+    chunks = []
+    chunk_hash = hashlib.md5()
+    last_cut = 0
+    chunk_start = 0
+    offset = 0
+    try:
+        for data in read_chunks(file_path, READ_SIZE, io_mode, throttle):
+            # Pick cut points from the candidates, honouring min/max chunk size
+            cuts = []
+            for candidate in find_candidates(data, offset, state, mask):
+                while candidate - last_cut > max_size:
+                    last_cut += max_size
+                    cuts.append(last_cut)
+                if candidate - last_cut >= min_size:
+                    last_cut = candidate
+                    cuts.append(candidate)
+            end = offset + len(data)
+            while end - last_cut > max_size:
+                last_cut += max_size
+                cuts.append(last_cut)
+
+            # Hash the chunks ending in this buffer in one pass over it
+            view = memoryview(data)
+            start = 0
+            for cut in cuts:
+                chunk_hash.update(view[start:cut - offset])
+                chunks.append((chunk_hash.digest(), cut - chunk_start))
+                chunk_hash = hashlib.md5()
+                start = cut - offset
+                chunk_start = cut
+            chunk_hash.update(view[start:])
+            offset = end
+    except Exception as e:
+        print(f"Error reading file {file_path}: {e}")
+        return file_path, None
+
+    if offset > chunk_start:
+        chunks.append((chunk_hash.digest(), offset - chunk_start))
+    return file_path, chunks
+
+def _chunk_file_args(args):
+    file_path, avg_size, io_mode = args
+    return chunk_file(file_path, avg_size, io_mode=io_mode, throttle=worker_throttle())
+
+def build_chunk_index(file_paths, avg_size=DEFAULT_AVG_CHUNK, workers=None, io_mode='buffered', throttle=None):
+    """
+    Chunk and hash many files in parallel and index the chunk digests.
+
+    Args:
+        file_paths (list): Files to chunk
+        avg_size (int): Target average chunk size in bytes (default: 64KB)
+        workers (int): Number of worker processes (default: CPU count)
+        io_mode (str): I/O mode, see bulk_io.IO_MODES (default: 'buffered')
+        throttle (int): Combined bytes/s limit, split evenly between workers (default: None)
+
+    Returns:
+        tuple: (file_chunks, chunk_files) where file_chunks maps each readable
+               file to its list of (digest, size) and chunk_files maps each
+               digest to the number of distinct files containing it
+    """
+    if avg_size < MIN_AVG_CHUNK:
+        raise ValueError(f"average chunk size must be at least {MIN_AVG_CHUNK} bytes")
+    if numpy is None:
+        print("Warning: numpy is not installed; chunking runs in pure Python at a few MB/s per core")
+
+    file_chunks = {}
+    chunk_files = {}
+    workers, worker_limit = worker_share(throttle, workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker_io, initargs=(worker_limit,)) as executor:
+        # Each worker returns a whole file's chunk list as one batch
+        jobs = ((file_path, avg_size, io_mode) for file_path in file_paths)
+        for file_path, chunks in executor.map(_chunk_file_args, jobs, chunksize=4):
+            print(f"Chunked: {file_path}")
+            if chunks is None:
+                continue
+            file_chunks[file_path] = chunks
+            for digest in {digest for digest, size in chunks}:
+                chunk_files[digest] = chunk_files.get(digest, 0) + 1
+    return file_chunks, chunk_files
+
+def dedupe_report(file_chunks, chunk_files):
+    """
+    Work out how many bytes each file shares with other files and the
+    overall dedupe savings.
+
+    Returns:
+        tuple: (per_file, total_bytes, unique_bytes) where per_file is a list
+               of (file_path, size, shared_bytes)
+    """
+    per_file = []
+    total_bytes = 0
+    unique_sizes = {}
+    for file_path, chunks in file_chunks.items():
+        size = 0
+        shared = 0
+        for digest, chunk_size in chunks:
+            size += chunk_size
+            if chunk_files[digest] > 1:
+                shared += chunk_size
+            unique_sizes[digest] = chunk_size
+        per_file.append((file_path, size, shared))
+        total_bytes += size
+    return per_file, total_bytes, sum(unique_sizes.values())
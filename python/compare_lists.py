@@ -1,82 +1,75 @@
 import os
 import argparse
 from pathlib import Path
+from list_manifest import parse_list_chunks, DIGEST_SEPARATOR
+from path_store import NamedPathIndex
 
-def parse_list_file(file_path):
+def parse_list_file(file_path, workers=None):
     """
     Parse a list.txt file and extract file paths.
     
     Args:
         file_path (str): Path to the list.txt file
+        workers (int): Number of parser processes for large manifests (default: CPU count)
         
     Returns:
-        dict: Dictionary with file names as keys and full paths as values
+        tuple: (file_dict, scheme)
+               file_dict (NamedPathIndex) maps file names to full paths. As in the
+               manifest line, a file's key (and path) keeps its " (Digest: ...)"
+               suffix, so files only match when name and digest both match. Parent
+               directories are stored once and full paths are built on lookup, so
+               huge manifests stay compact.
+               scheme (str) is the text of the "[SCHEME] ..." line, or None for a
+               manifest written with the legacy digest.
     """
-    file_dict = {}
+    # Fallback to the directory containing the list file if there is no [ROOT] line
+    file_dict = NamedPathIndex(Path(file_path).parent)
+    scheme = None
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        # Extract the root directory from the first line
-        root_line = lines[0].strip()
-        if root_line.startswith('[ROOT] '):
-            root_path = Path(root_line[7:].rstrip('/'))  # Remove '[ROOT] ' and trailing '/'
-        else:
-            # Fallback to the directory containing the list file
-            root_path = Path(file_path).parent
-        
-        # Process each line to extract file paths
-        for line in lines[1:]:  # Skip the first line which is the root
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Skip error lines
-            if '[ERROR]' in line:
-                continue
-                
-            # Extract the relative path from the line
-            rel_path = None
-            # Lines are formatted as: "  [DIR] folder/" or "  [FILE] filename"
-            if '[DIR]' in line:
-                # Extract directory name (remove indentation and [DIR] tag)
-                parts = line.split('[DIR] ')
-                if len(parts) > 1:
-                    rel_path = parts[1].rstrip('/')  # Remove trailing slash
-            elif '[FILE] ' in line:
-                # Extract file name (remove indentation and [FILE] tag)
-                parts = line.split('[FILE] ')
-                if len(parts) > 1:
-                    rel_path = parts[1]
-            
-            # Only process if we have a valid rel_path
-            if rel_path is not None:
-                # Construct full path
-                full_path = root_path / rel_path
-                # Use the file/directory name as the key
-                name = full_path.name
-                file_dict[name] = str(full_path)
+        # The manifest is split at top-level directories and parsed in parallel;
+        # chunks come back as compact arrays in manifest order
+        for chunk in parse_list_chunks(file_path, workers):
+            if chunk.root is not None:
+                file_dict.root = chunk.root
+            if chunk.scheme is not None:
+                scheme = chunk.scheme
+            dir_ids = [file_dict.dir_id(rel_dir) for rel_dir in chunk.dirs]
+            # Use the file/directory name, with the file's digest, as the key
+            for i, (name, parent) in enumerate(zip(chunk.names, chunk.parents)):
+                digest = chunk.digest(i)
+                if digest:
+                    name = f"{name}{DIGEST_SEPARATOR}{digest})"
+                file_dict.add(name, dir_ids[parent])
             
     except Exception as e:
         print(f"Error reading file {file_path}: {e}")
     
-    return file_dict
+    return file_dict, scheme
 
-def find_common_files(list1_path, list2_path):
+def find_common_files(list1_path, list2_path, workers=None):
     """
     Find files that exist in both list files.
     
     Args:
         list1_path (str): Path to the first list.txt file
         list2_path (str): Path to the second list.txt file
+        workers (int): Number of parser processes per list file (default: CPU count)
         
     Returns:
-        list: List of tuples containing common file names and their paths from both directories
+        list: List of tuples containing common file names and their paths from both directories,
+              or None if the two lists were written with different digest schemes
     """
     # Parse both list files
-    files1 = parse_list_file(list1_path)
-    files2 = parse_list_file(list2_path)
+    files1, scheme1 = parse_list_file(list1_path, workers)
+    files2, scheme2 = parse_list_file(list2_path, workers)
+    
+    # Digests from different schemes never agree, so nothing would match
+    if scheme1 != scheme2:
+        print(f"Error: The list files use different digest schemes "
+              f"({scheme1 or 'legacy'} vs {scheme2 or 'legacy'}); "
+              f"re-scan one of them with the other's settings.")
+        return None
     
     # Find common file names
     common_names = set(files1.keys()) & set(files2.keys())
@@ -116,6 +109,7 @@ def main():
     parser = argparse.ArgumentParser(description="Compare two list.txt files and print files that exist in both directories")
     parser.add_argument("list1", help="Path to the first list.txt file")
     parser.add_argument("list2", help="Path to the second list.txt file")
+    parser.add_argument("--workers", type=int, default=None, help="Number of parser processes for large list files (default: CPU count)")
     
     args = parser.parse_args()
     
@@ -129,7 +123,9 @@ def main():
         return
     
     # Find common files
-    common_files = find_common_files(args.list1, args.list2)
+    common_files = find_common_files(args.list1, args.list2, args.workers)
+    if common_files is None:
+        return
     
     # Delete .torrent files from the first directory
     deleted_count = delete_torrent_files(common_files)
@@ -1,42 +1,62 @@
 import os
 import argparse
+from file_filters import FileFilter, add_filter_arguments, filter_from_args
+from path_store import PathTrie
+from fs_core import Snapshot
 
-def compare_directories(dir_a, dir_b):
+def collect_files(directory, file_filter):
+    """
+    Collect the relative paths of all files under a directory.
+    
+    Args:
+        directory (str or Snapshot): Directory to walk, or a snapshot of it
+        file_filter (FileFilter): Filter applied while walking
+        
+    Returns:
+        PathTrie: Relative paths of the files, '/'-separated
+    """
+    if isinstance(directory, Snapshot):
+        # Already walked; no directory is listed again
+        return directory.path_trie(file_filter)
+    
+    paths = PathTrie()
+    for root, dirs, files in file_filter.walk(directory):
+        # Each directory is located in the trie once, not once per file
+        rel_root = os.path.relpath(root, directory).replace(os.sep, '/')
+        paths.add_many(rel_root, files)
+    return paths
+
+def compare_directories(dir_a, dir_b, file_filter=None):
     """
     Compare two directories and find files that exist in dir_a but not in dir_b
     
     Args:
-        dir_a (str): Path to directory A
-        dir_b (str): Path to directory B
+        dir_a (str or Snapshot): Path to directory A, or a snapshot of it
+        dir_b (str or Snapshot): Path to directory B, or a snapshot of it
+        file_filter (FileFilter): Filter applied to both trees; excluded directories are pruned (default: None)
         
     Returns:
         list: Files that exist in dir_a but not in dir_b
     """
-    # Get all files in directory A
-    files_a = set()
-    for root, dirs, files in os.walk(dir_a):
-        for file in files:
-            # Get relative path from dir_a
-            rel_path = os.path.relpath(os.path.join(root, file), dir_a)
-            files_a.add(rel_path)
+    if file_filter is None:
+        file_filter = FileFilter()
+    
+    # Get all files in directory A, stored as a trie so shared directory prefixes are kept once
+    files_a = collect_files(dir_a, file_filter)
     
     # Get all files in directory B
-    files_b = set()
-    for root, dirs, files in os.walk(dir_b):
-        for file in files:
-            # Get relative path from dir_b
-            rel_path = os.path.relpath(os.path.join(root, file), dir_b)
-            files_b.add(rel_path)
+    files_b = collect_files(dir_b, file_filter)
     
     # Find files that exist in A but not in B
-    diff_files = files_a - files_b
+    diff_files = files_a.difference(files_b, sep=os.sep)
     
     return sorted(list(diff_files))
 
 def main():
     parser = argparse.ArgumentParser(description='Compare two directories and find files that exist in directory A but not in directory B')
-    parser.add_argument('dir_a', help='Path to directory A')
-    parser.add_argument('dir_b', help='Path to directory B')
+    parser.add_argument('dir_a', help='Path to directory A, or a snapshot file saved by fs_core.py')
+    parser.add_argument('dir_b', help='Path to directory B, or a snapshot file saved by fs_core.py')
+    add_filter_arguments(parser)
     
     args = parser.parse_args()
     
@@ -49,8 +69,16 @@ def main():
         print(f"Error: Directory B '{args.dir_b}' does not exist.")
         return
     
+    # Snapshot files stand in for the directories they were taken of
+    try:
+        tree_a = Snapshot.load(args.dir_a) if os.path.isfile(args.dir_a) else args.dir_a
+        tree_b = Snapshot.load(args.dir_b) if os.path.isfile(args.dir_b) else args.dir_b
+    except Exception as e:
+        print(f"Error reading snapshot: {e}")
+        return
+    
     # Compare directories
-    diff_files = compare_directories(args.dir_a, args.dir_b)
+    diff_files = compare_directories(tree_a, tree_b, filter_from_args(args))
     
     # Output results
     if diff_files:
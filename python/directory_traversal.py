@@ -1,15 +1,39 @@
 import os
 import argparse
 import hashlib
+from file_filters import add_filter_arguments, filter_from_args, parse_size
+from file_md5_scanner import calculate_md5
+from list_manifest import open_manifest, COMPRESSION_EXTENSIONS
+from bulk_io import read_chunks, read_ranges
+from fs_core import Snapshot, cached_digest, add_cache_argument, load_cache, save_cache
 
-def calculate_digest(file_path):
+# Cache key for digests computed with the legacy scheme
+LEGACY_DIGEST_KIND = "legacy-head-tail-500k"
+
+# Default sampled-digest parameters: 16 windows of 64KB read 1MB per large file,
+# the same I/O budget as the legacy first/last 500KB digest
+DEFAULT_SAMPLES = 16
+DEFAULT_WINDOW = 64 * 1024
+
+def calculate_digest(file_path, samples=None, window=DEFAULT_WINDOW, io_mode="buffered", throttle=None):
     """
-    Calculate file digest based on file size:
+    Calculate file digest based on file size.
+    
+    Legacy scheme (samples is None):
     - For files < 1MB: MD5 of entire file
     - For files >= 1MB: MD5 of first 500KB + last 500KB
     
+    Sampled scheme (samples given):
+    - MD5 of the file size followed by the entire file if it is no larger
+      than samples * window, otherwise followed by `samples` windows of
+      `window` bytes spread evenly from the first to the last byte
+    
     Args:
         file_path (str): Path to the file
+        samples (int): Number of sample windows, or None for the legacy scheme (default: None)
+        window (int): Size of each sample window in bytes (default: 64KB)
+        io_mode (str): I/O mode, see bulk_io.IO_MODES (default: 'buffered')
+        throttle (Throttle): Optional bytes/s limit (default: None)
         
     Returns:
         str: Digest string or None if error
@@ -18,27 +42,96 @@ def calculate_digest(file_path):
         file_size = os.path.getsize(file_path)
         md5_hash = hashlib.md5()
         
-        with open(file_path, 'rb') as f:
-            if file_size < 1024 * 1024:  # Less than 1MB
-                # Read entire file
-                content = f.read()
-                md5_hash.update(content)
-            else:  # 1MB or larger
-                # Read first 500KB
-                first_part = f.read(500 * 1024)
-                md5_hash.update(first_part)
-                
-                # Seek to last 500KB
-                if file_size > 1024 * 1024:  # Larger than 1MB
-                    f.seek(-500 * 1024, 2)  # 2 means from end of file
-                    last_part = f.read(500 * 1024)
-                    md5_hash.update(last_part)
+        # ranges is None when the entire file is read
+        ranges = None
+        if samples is not None:
+            # Files that differ only in length must not collide
+            md5_hash.update(f"{file_size}:".encode('ascii'))
+            if file_size > samples * window:
+                last_offset = file_size - window
+                ranges = [(last_offset * i // (samples - 1) if samples > 1 else 0, window) for i in range(samples)]
+        elif file_size >= 1024 * 1024:  # 1MB or larger
+            # First 500KB
+            ranges = [(0, 500 * 1024)]
+            # Last 500KB
+            if file_size > 1024 * 1024:  # Larger than 1MB
+                ranges.append((file_size - 500 * 1024, 500 * 1024))
+        
+        if ranges is None:
+            chunks = read_chunks(file_path, 1024 * 1024, io_mode, throttle)
+        else:
+            chunks = read_ranges(file_path, ranges, io_mode, throttle)
+        for chunk in chunks:
+            md5_hash.update(chunk)
         
         return md5_hash.hexdigest()
     except Exception as e:
         return None
 
-def traverse_directory(path, depth=0, output_file=None):
+class DigestScheme:
+    """
+    Digest settings for one traversal, recorded in the manifest as a
+    "[SCHEME] ..." line after the root.
+    
+    With full_on_collision, files whose sampled digests collide are fully
+    hashed; those full MD5s are written as "[FULL] path (Digest: ...)" lines
+    at the end of the manifest.
+    """
+    
+    def __init__(self, samples=DEFAULT_SAMPLES, window=DEFAULT_WINDOW, full_on_collision=False):
+        self.samples = samples
+        self.window = window
+        self.full_on_collision = full_on_collision
+        # digest -> [rel_path, file_path, escalated] of the first file seen with it
+        self.seen = {}
+        self.full_hashes = []
+    
+    @classmethod
+    def parse(cls, text):
+        """
+        Parse the text of a "[SCHEME] ..." line; None (no line) means the legacy scheme.
+        
+        Returns:
+            DigestScheme: The scheme; samples is None for the legacy scheme
+        """
+        if not text:
+            return cls(samples=None)
+        fields = dict(part.split('=', 1) for part in text.split()[1:] if '=' in part)
+        return cls(samples=int(fields.get('samples', DEFAULT_SAMPLES)), window=int(fields.get('window', DEFAULT_WINDOW)))
+    
+    def describe(self):
+        """Text for the "[SCHEME] ..." manifest line, or None for the legacy scheme"""
+        if self.samples is None:
+            return None
+        return f"sampled-md5 samples={self.samples} window={self.window}"
+    
+    def digest(self, file_path, io_mode="buffered", throttle=None):
+        """Calculate the digest of a file with this scheme"""
+        return calculate_digest(file_path, self.samples, self.window, io_mode, throttle)
+    
+    def cache_kind(self):
+        """Key for this scheme's digests in the shared stat/digest cache"""
+        return self.describe() or LEGACY_DIGEST_KIND
+    
+    def record(self, rel_path, file_path, digest):
+        """Remember a file's digest and fully hash both files on a collision"""
+        if not self.full_on_collision or not digest:
+            return
+        first = self.seen.get(digest)
+        if first is None:
+            self.seen[digest] = [rel_path, file_path, False]
+            return
+        if not first[2]:
+            first[2] = True
+            self._escalate(first[0], first[1])
+        self._escalate(rel_path, file_path)
+    
+    def _escalate(self, rel_path, file_path):
+        full_hash = cached_digest(file_path, "md5", calculate_md5)
+        if full_hash:
+            self.full_hashes.append((rel_path, full_hash))
+
+def traverse_directory(path, depth=0, output_file=None, file_filter=None, rel_path="", scheme=None, snapshot=None, skip_name=None):
     """
     Recursively traverse a directory and print all files and folders with indentation
     based on directory depth. Also writes output to a file if specified.
@@ -47,30 +140,56 @@ def traverse_directory(path, depth=0, output_file=None):
         path (str): The directory path to traverse
         depth (int): Current depth level for indentation (default: 0)
         output_file (file object): File object to write output to (default: None)
+        file_filter (FileFilter): Filter for files; excluded directories are not descended into (default: None)
+        rel_path (str): Path of this directory relative to the traversal root, used for path globs (default: "")
+        scheme (DigestScheme): Digest scheme for files (default: None, the legacy scheme)
+        snapshot (Snapshot): Snapshot of the traversal root to list directories from instead of
+                             the filesystem (default: None)
+        skip_name (str): File name in the traversal root to leave out, i.e. the manifest being
+                         written, whose digest would be of a half-written file (default: None)
     """
     # Create indentation based on depth
     indent = "  " * depth
     
     try:
-        # Get all items in the directory
-        items = os.listdir(path)
-        # Sort items to have consistent ordering (directories first, then files)
-        items.sort(key=lambda x: (not os.path.isdir(os.path.join(path, x)), x.lower()))
+        if snapshot is not None:
+            # Listing comes from the snapshot, already sorted, without touching the disk
+            entries = snapshot.listdir(rel_path)
+        else:
+            # Get all items in the directory
+            items = os.listdir(path)
+            entries = [(item, os.path.isdir(os.path.join(path, item))) for item in items]
+            # Sort items to have consistent ordering (directories first, then files)
+            entries.sort(key=lambda entry: (not entry[1], entry[0].lower()))
         
-        for item in items:
+        for item, is_dir in entries:
             item_path = os.path.join(path, item)
+            item_rel_path = f"{rel_path}/{item}" if rel_path else item
             
-            if os.path.isdir(item_path):
+            if is_dir:
+                # Prune excluded directories before descending into them
+                if file_filter and not file_filter.dir_allowed(item, item_rel_path):
+                    continue
                 # Print directory name with trailing slash
                 output_line = f"{indent}[DIR] {item}/"
                 print(output_line)
                 if output_file:
                     output_file.write(output_line + "\n")
                 # Recursively traverse subdirectory
-                traverse_directory(item_path, depth + 1, output_file)
+                traverse_directory(item_path, depth + 1, output_file, file_filter, item_rel_path, scheme, snapshot)
             else:
-                # For files, also calculate and display digest
-                digest = calculate_digest(item_path)
+                if depth == 0 and item == skip_name:
+                    continue
+                if file_filter and not file_filter.matches(item, item_rel_path, item_path):
+                    continue
+                # For files, also calculate and display digest; unchanged files hit the shared cache when enabled
+                if scheme is None:
+                    scheme = DigestScheme(samples=None)
+                if snapshot is not None:
+                    digest = snapshot.digest(item_rel_path, scheme.cache_kind(), scheme.digest)
+                else:
+                    digest = cached_digest(item_path, scheme.cache_kind(), scheme.digest)
+                scheme.record(item_rel_path, item_path, digest)
                 if digest:
                     output_line = f"{indent}[FILE] {item} (Digest: {digest})"
                 else:
@@ -97,10 +216,27 @@ def traverse_directory(path, depth=0, output_file=None):
 
 def main():
     parser = argparse.ArgumentParser(description="Recursively traverse a directory and print all files and folders with indentation")
-    parser.add_argument("directory", nargs="?", default=".", help="Directory path to traverse (default: current directory)")
+    parser.add_argument("directory", nargs="?", default=".", help="Directory path to traverse, or a snapshot file saved by fs_core.py (default: current directory)")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help=f"Number of sample windows per large file (default: {DEFAULT_SAMPLES})")
+    parser.add_argument("--window", type=parse_size, default=DEFAULT_WINDOW, help="Size of each sample window, e.g. 64K (default: 64K)")
+    parser.add_argument("--full-on-collision", action="store_true", help="Fully hash files whose sampled digests collide and append their MD5s")
+    parser.add_argument("--legacy-digest", action="store_true", help="Use the old first/last 500KB digest (no size, no [SCHEME] line)")
+    parser.add_argument("--compress", choices=sorted(COMPRESSION_EXTENSIONS), help="Write a compressed manifest (list.txt.gz or list.txt.xz)")
+    add_filter_arguments(parser)
+    add_cache_argument(parser)
     
     args = parser.parse_args()
     
+    # A snapshot file stands in for the directory it was taken of
+    snapshot = None
+    if os.path.isfile(args.directory):
+        try:
+            snapshot = Snapshot.load(args.directory)
+        except Exception as e:
+            print(f"Error reading snapshot {args.directory}: {e}")
+            return
+        args.directory = snapshot.top
+    
     # Check if the provided path exists
     if not os.path.exists(args.directory):
         print(f"Error: Directory '{args.directory}' does not exist.")
@@ -111,24 +247,51 @@ def main():
         print(f"Error: '{args.directory}' is not a directory.")
         return
     
+    if args.samples < 1:
+        print("Error: --samples must be at least 1.")
+        return
+    
+    if args.window < 1:
+        print("Error: --window must be at least 1 byte.")
+        return
+    
     # Create output file path
     output_file_path = os.path.join(args.directory, "list.txt")
+    if args.compress:
+        output_file_path += COMPRESSION_EXTENSIONS[args.compress]
     
+    load_cache(args.cache)
     try:
-        # Open output file for writing
-        with open(output_file_path, "w", encoding="utf-8") as output_file:
+        # Open output file for writing (compressed as a stream when requested)
+        with open_manifest(output_file_path, "w") as output_file:
             # Print the root directory
             root_line = f"[ROOT] {os.path.abspath(args.directory)}/"
             print(root_line)
             output_file.write(root_line + "\n")
             
-            # Traverse the directory
-            traverse_directory(args.directory, output_file=output_file)
+            # Record how digests were computed, so readers can recompute them
+            scheme = DigestScheme(None if args.legacy_digest else args.samples, args.window, args.full_on_collision)
+            if scheme.describe():
+                scheme_line = f"[SCHEME] {scheme.describe()}"
+                print(scheme_line)
+                output_file.write(scheme_line + "\n")
+            
+            # Traverse the directory; the manifest being written is left out, its digest would be of a partial file
+            traverse_directory(args.directory, output_file=output_file, file_filter=filter_from_args(args),
+                               scheme=scheme, snapshot=snapshot, skip_name=os.path.basename(output_file_path))
+            
+            # Full MD5s of files whose sampled digests collided
+            for rel_path, full_hash in scheme.full_hashes:
+                full_line = f"[FULL] {rel_path} (Digest: {full_hash})"
+                print(full_line)
+                output_file.write(full_line + "\n")
         
         print(f"\nOutput also written to: {output_file_path}")
         
     except Exception as e:
         print(f"Error writing to output file: {e}")
+    finally:
+        save_cache(args.cache)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
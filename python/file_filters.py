@@ -0,0 +1,192 @@
+import os
+import re
+import fnmatch
+from datetime import datetime
+
+# Directories worth skipping on most backup/source trees (enabled with --prune-common)
+COMMON_EXCLUDE_DIRS = ['.git', '.svn', '.hg', 'node_modules', '__pycache__', '.snapshot', '.snapshots',
+                       '@eaDir', '$RECYCLE.BIN', 'System Volume Information']
+
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+def compile_globs(patterns):
+    """
+    Compile glob patterns into a single case-insensitive regex.
+
+    Args:
+        patterns (list): Glob patterns such as '*.zip' or 'photos/*/raw'
+
+    Returns:
+        re.Pattern: Compiled regex, or None if there are no patterns
+    """
+    if not patterns:
+        return None
+    return re.compile('|'.join(fnmatch.translate(p) for p in patterns), re.IGNORECASE)
+
+def parse_size(value):
+    """Parse a size such as '500', '10K', '4M' or '2G' into bytes"""
+    value = value.strip().upper().rstrip('B')
+    unit = value[-1:] if value[-1:] in SIZE_UNITS else ''
+    number = value[:-1] if unit else value
+    return int(float(number) * SIZE_UNITS[unit])
+
+def parse_time(value):
+    """Parse an ISO date/time ('2024-01-31' or '2024-01-31T12:00') or a Unix timestamp"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+class FileFilter:
+    """
+    Include/exclude globs plus size and mtime predicates, compiled once and
+    applied while walking a tree.
+
+    Patterns containing '/' are matched against the path relative to the scan
+    root (with '/' separators); all other patterns are matched against the
+    bare file or directory name.
+    """
+
+    def __init__(self, include=None, exclude=None, exclude_dirs=None,
+                 min_size=None, max_size=None, newer_than=None, older_than=None):
+        self.include_names = compile_globs([p for p in include or [] if '/' not in p])
+        self.include_paths = compile_globs([p for p in include or [] if '/' in p])
+        self.exclude_names = compile_globs([p for p in exclude or [] if '/' not in p])
+        self.exclude_paths = compile_globs([p for p in exclude or [] if '/' in p])
+        self.exclude_dir_names = compile_globs([p for p in exclude_dirs or [] if '/' not in p])
+        self.exclude_dir_paths = compile_globs([p for p in exclude_dirs or [] if '/' in p])
+        self.has_include = bool(include)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.newer_than = newer_than
+        self.older_than = older_than
+        self.needs_stat = any(v is not None for v in (min_size, max_size, newer_than, older_than))
+
+    @classmethod
+    def from_extensions(cls, extensions):
+        """Build a filter equivalent to the old 'endswith any of EXTENSIONS' check"""
+        if not extensions:
+            return cls()
+        extensions = [ext if ext.startswith('.') else '.' + ext for ext in extensions]
+        return cls(include=['*' + ext for ext in extensions])
+
+    def dir_allowed(self, name, rel_path=None):
+        """Return True if the walk should descend into the directory"""
+        if self.exclude_dir_names and self.exclude_dir_names.match(name):
+            return False
+        if self.exclude_dir_paths and rel_path is not None and self.exclude_dir_paths.match(rel_path):
+            return False
+        return True
+
+    def prune(self, root, dirs, top):
+        """
+        Remove excluded directories from an os.walk dirs list in place, so
+        they are never descended into.
+
+        Args:
+            root (str): Current os.walk root
+            dirs (list): The os.walk dirs list for root
+            top (str): The directory the walk started from
+        """
+        if not self.exclude_dir_names and not self.exclude_dir_paths:
+            return
+        rel_root = os.path.relpath(root, top)
+        keep = []
+        for name in dirs:
+            rel_path = name if rel_root == '.' else f"{rel_root}/{name}".replace(os.sep, '/')
+            if self.dir_allowed(name, rel_path):
+                keep.append(name)
+        dirs[:] = keep
+
+    def matches(self, name, rel_path=None, path=None):
+        """
+        Return True if a file passes the include/exclude globs and the size
+        and mtime predicates.
+
+        Args:
+            name (str): File name
+            rel_path (str): Path relative to the scan root, '/' separated (for path globs)
+            path (str): Full path, needed only when size/mtime predicates are set
+        """
+        if self.has_include:
+            if not ((self.include_names and self.include_names.match(name)) or
+                    (self.include_paths and rel_path is not None and self.include_paths.match(rel_path))):
+                return False
+        if self.exclude_names and self.exclude_names.match(name):
+            return False
+        if self.exclude_paths and rel_path is not None and self.exclude_paths.match(rel_path):
+            return False
+        if self.needs_stat:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return False
+            if self.min_size is not None and st.st_size < self.min_size:
+                return False
+            if self.max_size is not None and st.st_size > self.max_size:
+                return False
+            if self.newer_than is not None and st.st_mtime < self.newer_than:
+                return False
+            if self.older_than is not None and st.st_mtime >= self.older_than:
+                return False
+        return True
+
+    def walk(self, top):
+        """
+        os.walk over top with excluded directories pruned before descent.
+
+        Yields:
+            tuple: (root, dirs, files) where files already passed the filter
+        """
+        filters_files = (self.has_include or self.exclude_names or self.exclude_paths or self.needs_stat)
+        uses_paths = bool(self.include_paths or self.exclude_paths)
+        for root, dirs, files in os.walk(top):
+            self.prune(root, dirs, top)
+            if not filters_files:
+                yield root, dirs, files
+                continue
+            rel_root = os.path.relpath(root, top).replace(os.sep, '/') if uses_paths else None
+            kept = []
+            for name in files:
+                rel_path = None
+                if uses_paths:
+                    rel_path = name if rel_root == '.' else f"{rel_root}/{name}"
+                if self.matches(name, rel_path, os.path.join(root, name) if self.needs_stat else None):
+                    kept.append(name)
+            yield root, dirs, kept
+
+def add_filter_arguments(parser):
+    """Add the shared include/exclude/size/mtime options to an argparse parser"""
+    group = parser.add_argument_group("filters")
+    group.add_argument("--include", action="append", metavar="GLOB", help="Only files matching this glob (repeatable)")
+    group.add_argument("--exclude", action="append", metavar="GLOB", help="Skip files matching this glob (repeatable)")
+    group.add_argument("--exclude-dir", action="append", metavar="GLOB", help="Do not descend into directories matching this glob (repeatable)")
+    group.add_argument("--prune-common", action="store_true", help=f"Also skip common clutter directories: {', '.join(COMMON_EXCLUDE_DIRS)}")
+    group.add_argument("--min-size", type=parse_size, help="Only files at least this big (e.g. 10K, 4M, 1G)")
+    group.add_argument("--max-size", type=parse_size, help="Only files at most this big (e.g. 10K, 4M, 1G)")
+    group.add_argument("--newer-than", type=parse_time, help="Only files modified at or after this date/time (ISO or Unix timestamp)")
+    group.add_argument("--older-than", type=parse_time, help="Only files modified before this date/time (ISO or Unix timestamp)")
+
+def filter_from_args(args, default_include=None):
+    """
+    Build a FileFilter from options added by add_filter_arguments.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+        default_include (list): Include globs used when --include is not given
+
+    Returns:
+        FileFilter: The compiled filter
+    """
+    exclude_dirs = list(args.exclude_dir or [])
+    if args.prune_common:
+        exclude_dirs.extend(COMMON_EXCLUDE_DIRS)
+    return FileFilter(
+        include=args.include or default_include,
+        exclude=args.exclude,
+        exclude_dirs=exclude_dirs,
+        min_size=args.min_size,
+        max_size=args.max_size,
+        newer_than=args.newer_than,
+        older_than=args.older_than,
+    )
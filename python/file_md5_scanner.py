@@ -1,73 +1,360 @@
 import os
 import hashlib
+import tarfile
+import zipfile
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from file_filters import FileFilter, add_filter_arguments, filter_from_args, parse_size
+from bulk_io import Throttle, read_chunks, open_managed, add_io_arguments, init_worker_io, worker_throttle, worker_share
+from list_manifest import open_manifest
+from chunk_index import DEFAULT_AVG_CHUNK, MIN_AVG_CHUNK, build_chunk_index, dedupe_report
+from fs_core import Snapshot, cached_digest, add_cache_argument, load_cache, save_cache
 
-# Set the file extensions to scan for here
+# py7zr is optional; without it .7z archives are only hashed as whole files
+try:
+    import py7zr
+    from py7zr.io import Py7zIO, WriterFactory
+except ImportError:
+    py7zr = None
+
+# Default file extensions to scan for, used when --include is not given on the command line
 # Example: EXTENSIONS = ['.txt', '.py', '.jpg'] to scan for text, Python, and JPEG files
 # Leave as None or [] to scan all files
 EXTENSIONS = ['.7z', '.zip', '.tar']  # Change this to your desired extensions
 
-def calculate_md5(file_path):
-    """Calculate MD5 hash of a file"""
+def calculate_md5(file_path, io_mode="buffered", throttle=None):
+    """
+    Calculate MD5 hash of a file
+    
+    Args:
+        file_path (str): Path to the file
+        io_mode (str): 'buffered', 'fadvise' or 'direct', see bulk_io.IO_MODES (default: 'buffered')
+        throttle (Throttle): Optional bytes/s limit shared across calls (default: None)
+    """
     hash_md5 = hashlib.md5()
     try:
-        with open(file_path, "rb") as f:
-            # Read file in 4MB chunks for better performance
-            for chunk in iter(lambda: f.read(4 * 1024 * 1024), b""):
-                hash_md5.update(chunk)
+        # Read file in 4MB chunks for better performance
+        for chunk in read_chunks(file_path, 4 * 1024 * 1024, io_mode, throttle):
+            hash_md5.update(chunk)
         return hash_md5.hexdigest()
     except Exception as e:
         print(f"Error reading file {file_path}: {e}")
         return None
 
-def scan_directory(directory_path, extensions=None):
-    """Recursively scan directory for files with specific extensions and calculate their MD5 hashes"""
-    results = []
+CHUNK_SIZE = 4 * 1024 * 1024
+
+def hash_stream(stream):
+    """Calculate MD5 hash and size of a readable binary stream, in chunks"""
+    hash_md5 = hashlib.md5()
+    size = 0
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        hash_md5.update(chunk)
+        size += len(chunk)
+    return hash_md5.hexdigest(), size
+
+def hash_zip_members(archive_file):
+    """Hash every file member of a zip archive (path or seekable binary file) without extracting it"""
+    members = []
+    with zipfile.ZipFile(archive_file) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            with archive.open(info) as member:
+                md5_hash, size = hash_stream(member)
+            members.append((info.filename, md5_hash, size))
+    return members
+
+def hash_tar_members(archive_file):
+    """Hash every regular file member of a (possibly compressed) tar archive (path or binary file) without extracting it"""
+    members = []
+    # Stream mode reads the archive sequentially, which also works for compressed tars
+    if isinstance(archive_file, str):
+        archive = tarfile.open(archive_file, "r|*")
+    else:
+        archive = tarfile.open(fileobj=archive_file, mode="r|*")
+    with archive:
+        for info in archive:
+            if not info.isfile():
+                continue
+            member = archive.extractfile(info)
+            md5_hash, size = hash_stream(member)
+            members.append((info.name, md5_hash, size))
+    return members
+
+if py7zr is not None:
+    class _HashIO(Py7zIO):
+        """Write-only sink that hashes decompressed 7z member data instead of storing it"""
+
+        def __init__(self):
+            self.hash_md5 = hashlib.md5()
+            self.length = 0
+
+        def write(self, s):
+            self.hash_md5.update(s)
+            self.length += len(s)
+            return len(s)
+
+        def read(self, size=None):
+            return b""
+
+        def seek(self, offset, whence=0):
+            return self.length
+
+        def flush(self):
+            pass
+
+        def size(self):
+            return self.length
+
+    class _HashFactory(WriterFactory):
+        def __init__(self):
+            self.sinks = {}
+
+        def create(self, filename):
+            sink = _HashIO()
+            self.sinks[filename] = sink
+            return sink
+
+def hash_7z_members(archive_file):
+    """Hash every file member of a 7z archive (path or seekable binary file) without extracting it (requires py7zr)"""
+    factory = _HashFactory()
+    with py7zr.SevenZipFile(archive_file, mode="r") as archive:
+        archive.extractall(factory=factory)
+    return [(name, sink.hash_md5.hexdigest(), sink.length) for name, sink in factory.sinks.items()]
+
+def archive_fingerprint(members):
+    """
+    Build a content fingerprint from archive members.
+    
+    Members are sorted by name and digest first, so the fingerprint depends only
+    on member names and contents, not on member order or compression settings.
+    """
+    normalized = []
+    for name, md5_hash, size in members:
+        # tar archives created with "tar -C dir ." prefix every member with "./"
+        if name.startswith("./"):
+            name = name[2:]
+        normalized.append((name, md5_hash, size))
+    
+    fingerprint = hashlib.md5()
+    for name, md5_hash, size in sorted(normalized):
+        fingerprint.update(f"{name}\0{size}\0{md5_hash}\n".encode("utf-8"))
+    return fingerprint.hexdigest()
+
+def hash_archive_members(file_path, io_mode="buffered", throttle=None):
+    """
+    Hash the members of a zip, tar or 7z archive. Files that cannot be
+    opened as archives (including .7z without py7zr) fall back to the MD5
+    of the whole file.
     
-    # Normalize extensions (ensure they start with a dot)
-    if extensions:
-        extensions = [ext if ext.startswith('.') else '.' + ext for ext in extensions]
+    Args:
+        file_path (str): Path to the archive
+        io_mode (str): I/O mode, see bulk_io.IO_MODES (default: 'buffered')
+        throttle (Throttle): Optional bytes/s limit (default: None)
+        
+    Returns:
+        tuple: (file_path, fingerprint, members) where members is a list of
+               (name, md5, size), or None when fingerprint is the whole-file
+               MD5; fingerprint and members are None if the file could not
+               be read
+    """
+    try:
+        # Every read of the archive goes through the requested I/O mode and throttle
+        with open_managed(file_path, io_mode, throttle) as f:
+            members = None
+            is_zip = zipfile.is_zipfile(f)
+            # The format checks read from the file; start each reader at the beginning
+            f.seek(0)
+            if is_zip:
+                members = hash_zip_members(f)
+            elif file_path.lower().endswith(".7z") and py7zr is not None:
+                members = hash_7z_members(f)
+            elif tarfile.is_tarfile(f):
+                f.seek(0)
+                members = hash_tar_members(f)
+        if members is None:
+            print(f"Unsupported archive, hashing whole file: {file_path}")
+            return file_path, calculate_md5(file_path, io_mode, throttle), None
+        return file_path, archive_fingerprint(members), members
+    except Exception as e:
+        print(f"Error reading archive {file_path}: {e}")
+        return file_path, None, None
+
+def _hash_archive_job(args):
+    file_path, io_mode = args
+    return hash_archive_members(file_path, io_mode, worker_throttle())
+
+def scan_archives(file_paths, workers=None, io_mode="buffered", throttle=None):
+    """
+    Hash archive members for many archives in parallel.
     
-    # Walk through directory tree
-    for root, dirs, files in os.walk(directory_path):
+    Args:
+        file_paths (list): Archive paths
+        workers (int): Number of worker processes (default: CPU count)
+        io_mode (str): I/O mode, see bulk_io.IO_MODES (default: 'buffered')
+        throttle (int): Combined bytes/s limit, split evenly between workers (default: None)
+        
+    Returns:
+        list: (file_path, fingerprint, members) tuples for readable archives
+    """
+    results = []
+    workers, worker_limit = worker_share(throttle, workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker_io, initargs=(worker_limit,)) as executor:
+        jobs = ((file_path, io_mode) for file_path in file_paths)
+        for file_path, fingerprint, members in executor.map(_hash_archive_job, jobs):
+            print(f"Processed: {file_path}")
+            if fingerprint:
+                results.append((file_path, fingerprint, members))
+    return results
+
+def find_files(directory_path, file_filter=None):
+    """Recursively yield paths of files that pass the filter (or all files if no filter given); directory_path may be a Snapshot"""
+    if file_filter is None:
+        file_filter = FileFilter()
+    
+    # Walk through directory tree (or the snapshot of it); excluded directories are pruned before descent
+    if isinstance(directory_path, Snapshot):
+        walk = directory_path.walk(file_filter)
+    else:
+        walk = file_filter.walk(directory_path)
+    for root, dirs, files in walk:
         for file in files:
-            file_path = os.path.join(root, file)
-            
-            # Check if file has one of the specified extensions (or all files if no extensions specified)
-            if extensions is None or len(extensions) == 0 or any(file.lower().endswith(ext.lower()) for ext in extensions):
-                # Print file path before processing
-                print(f"Processing: {file_path}")
-                md5_hash = calculate_md5(file_path)
-                if md5_hash:
-                    results.append((file_path, md5_hash))
+            yield os.path.join(root, file)
+
+def scan_directory(directory_path, extensions=None, file_filter=None, io_mode="buffered", throttle=None):
+    """Recursively scan directory for files with specific extensions (or matching a filter) and calculate their MD5 hashes"""
+    results = []
+    
+    if file_filter is None:
+        file_filter = FileFilter.from_extensions(extensions)
+    
+    def compute(path):
+        return calculate_md5(path, io_mode, throttle)
+    
+    for file_path in find_files(directory_path, file_filter):
+        # Print file path before processing
+        print(f"Processing: {file_path}")
+        # With the cache enabled, files unchanged since they were last hashed (by any tool) are not read again
+        md5_hash = cached_digest(file_path, "md5", compute)
+        if md5_hash:
+            results.append((file_path, md5_hash))
     
     return results
 
 def main():
     parser = argparse.ArgumentParser(description="Scan directory for files and calculate their MD5 hashes")
-    parser.add_argument("directory", help="Directory path to scan")
+    parser.add_argument("directory", help="Directory path to scan, or a snapshot file saved by fs_core.py")
+    parser.add_argument("--members", action="store_true", help="Hash archive members instead of the archive files themselves")
+    parser.add_argument("--workers", type=int, default=None, help="Number of parallel workers for --members/--chunks (default: CPU count)")
+    parser.add_argument("--verbose", action="store_true", help="With --members, also list each member and its MD5")
+    parser.add_argument("--chunks", action="store_true", help="Split files into content-defined chunks and report bytes shared with other files")
+    parser.add_argument("--avg-chunk", type=parse_size, default=DEFAULT_AVG_CHUNK, help=f"Average chunk size for --chunks, e.g. 64K, at least {MIN_AVG_CHUNK} (default: 64K). "
+                        "Install numpy for speed: without it chunking runs at only a few MB/s per core")
+    parser.add_argument("--output", help="Also write results to this file (gzip/xz compressed if it ends in .gz/.xz)")
+    add_filter_arguments(parser)
+    add_io_arguments(parser)
+    add_cache_argument(parser)
     
     args = parser.parse_args()
     
+    # A snapshot file stands in for the directory it was taken of. Paths are
+    # absolute either way, so saved results can be verified from any directory
+    tree = os.path.abspath(args.directory)
+    if os.path.isfile(args.directory):
+        try:
+            tree = Snapshot.load(args.directory)
+        except Exception as e:
+            print(f"Error reading snapshot {args.directory}: {e}")
+            return
+        args.directory = tree.top
+    
     # Check if directory exists
     if not os.path.isdir(args.directory):
         print(f"Error: Directory '{args.directory}' does not exist.")
         return
     
+    if args.chunks and args.avg_chunk < MIN_AVG_CHUNK:
+        print(f"Error: --avg-chunk must be at least {MIN_AVG_CHUNK} bytes.")
+        return
+    
+    # The digest cache holds whole-file MD5s, which only the plain scan produces
+    if args.cache and (args.members or args.chunks):
+        print("Error: --cache only applies to plain MD5 scans, not --members or --chunks.")
+        return
+    
     # Scan directory
-    print(f"Scanning directory: {args.directory}")
-    if EXTENSIONS:
+    # Absolute, so output saved from stdout can be verified from any directory
+    print(f"Scanning directory: {os.path.abspath(args.directory)}")
+    default_include = ['*' + ext for ext in EXTENSIONS] if EXTENSIONS else None
+    file_filter = filter_from_args(args, default_include)
+    if args.include:
+        print(f"Looking for files matching: {', '.join(args.include)}")
+    elif EXTENSIONS:
         print(f"Looking for files with extensions: {', '.join(EXTENSIONS)}")
     else:
         print("Looking for all files")
     
-    results = scan_directory(args.directory, EXTENSIONS)
+    # Prepare output content
+    output_lines = []
+    
+    if args.members:
+        results = scan_archives(list(find_files(tree, file_filter)), args.workers, args.io_mode, args.throttle)
+        
+        # One content fingerprint per archive
+        for file_path, fingerprint, members in results:
+            if members is None:
+                # Whole-file MD5, in the same format as a plain scan
+                try:
+                    output_lines.append(f"{file_path} | {fingerprint} | {os.path.getsize(file_path)}")
+                except OSError:
+                    output_lines.append(f"{file_path} | {fingerprint}")
+                continue
+            output_lines.append(f"{file_path} | {fingerprint} | {len(members)} members")
+            if args.verbose:
+                for name, md5_hash, size in sorted(members):
+                    output_lines.append(f"    {name} | {md5_hash} | {size}")
+    elif args.chunks:
+        file_chunks, chunk_files = build_chunk_index(list(find_files(tree, file_filter)), args.avg_chunk, args.workers,
+                                                   args.io_mode, args.throttle)
+        per_file, total_bytes, unique_bytes = dedupe_report(file_chunks, chunk_files)
+        
+        # Bytes each file shares with at least one other file, then the overall estimate
+        for file_path, size, shared in per_file:
+            percent = 100.0 * shared / size if size else 0.0
+            output_lines.append(f"{file_path} | {size} | shared {shared} ({percent:.1f}%)")
+        savings = total_bytes - unique_bytes
+        percent = 100.0 * savings / total_bytes if total_bytes else 0.0
+        output_lines.append(f"Total: {total_bytes} bytes, unique chunks: {unique_bytes} bytes, "
+                            f"estimated dedupe savings: {savings} bytes ({percent:.1f}%)")
+    else:
+        throttle = Throttle(args.throttle) if args.throttle else None
+        load_cache(args.cache)
+        results = scan_directory(tree, file_filter=file_filter, io_mode=args.io_mode, throttle=throttle)
+        save_cache(args.cache)
+        
+        for file_path, md5_hash in results:
+            # The size column lets manifest_verify.py catch truncated copies with stat alone
+            try:
+                output_lines.append(f"{file_path} | {md5_hash} | {os.path.getsize(file_path)}")
+            except OSError:
+                output_lines.append(f"{file_path} | {md5_hash}")
     
     # Output results
     print("\nResults:")
     print("-" * 50)
-    for file_path, md5_hash in results:
-        print(f"{file_path} | {md5_hash}")
+    for line in output_lines:
+        print(line)
+    
+    # Write results to a manifest file, compressed if it ends in .gz or .xz
+    if args.output:
+        try:
+            with open_manifest(args.output, "w") as f:
+                f.write(f"Scanning directory: {os.path.abspath(args.directory)}\n")
+                for line in output_lines:
+                    f.write(line + "\n")
+            print(f"\nResults also written to: {args.output}")
+        except Exception as e:
+            print(f"Error writing to output file: {e}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
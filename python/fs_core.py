@@ -0,0 +1,414 @@
+import os
+import json
+import errno
+import argparse
+from path_store import PathTrie
+from file_filters import FileFilter, add_filter_arguments, filter_from_args
+from list_manifest import open_manifest
+
+CACHE_VERSION = 1
+
+class StatCache:
+    """
+    Digests keyed by absolute path and digest kind, valid only while the
+    file's size and mtime are unchanged.
+
+    One cache is shared by every tool in a process once it is enabled (see
+    enable_cache and cached_digest) and can be saved to and loaded from a
+    JSON file (gzip/xz compressed when the name ends in .gz/.xz) so
+    unchanged files are not re-hashed on the next run. It keeps an entry
+    per file hashed, so it is off unless a tool or workflow asks for it.
+    """
+
+    def __init__(self):
+        # path -> [size, mtime_ns, {kind: digest}]
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def digest(self, path, kind, compute, st=None):
+        """
+        Return the cached digest of a file or compute and remember it.
+
+        Args:
+            path (str): Path to the file
+            kind (str): Digest kind, e.g. 'md5' or a sampled-digest scheme description
+            compute (callable): Called with path to compute the digest on a miss
+            st (os.stat_result or tuple): Known (size, mtime_ns) or stat result, to avoid another stat (default: None)
+
+        Returns:
+            str: The digest, or None if it could not be computed
+        """
+        path = os.path.abspath(path)
+        try:
+            size, mtime_ns = _size_mtime(st if st is not None else os.stat(path))
+        except OSError:
+            return None
+        entry = self.entries.get(path)
+        if entry is None or entry[0] != size or entry[1] != mtime_ns:
+            entry = self.entries[path] = [size, mtime_ns, {}]
+        digest = entry[2].get(kind)
+        if digest is not None:
+            self.hits += 1
+            return digest
+        self.misses += 1
+        digest = compute(path)
+        if digest is not None:
+            entry[2][kind] = digest
+        return digest
+
+    def forget(self, path):
+        """Drop a path, e.g. after it was moved or deleted"""
+        self.entries.pop(os.path.abspath(path), None)
+
+    def load(self, cache_path):
+        """Merge entries from a saved cache file; a missing or unreadable file is ignored"""
+        try:
+            with open_manifest(cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            if os.path.exists(cache_path):
+                print(f"Error reading cache {cache_path}: {e}")
+            return
+        if data.get("version") == CACHE_VERSION:
+            self.entries.update(data.get("entries", {}))
+
+    def save(self, cache_path):
+        """Write the cache to a file"""
+        with open_manifest(cache_path, "w") as f:
+            json.dump({"version": CACHE_VERSION, "entries": self.entries}, f, ensure_ascii=False, separators=(',', ':'))
+
+_default_cache = None
+
+def get_cache():
+    """Return the stat/digest cache shared by all tools in this process, or None if it is not enabled"""
+    return _default_cache
+
+def enable_cache():
+    """Enable the shared stat/digest cache (e.g. for a multi-step workflow) and return it"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = StatCache()
+    return _default_cache
+
+def cached_digest(path, kind, compute, st=None):
+    """
+    Digest of a file through the shared cache when it is enabled; otherwise
+    computed directly, without remembering anything.
+    """
+    cache = _default_cache
+    if cache is None:
+        return compute(path)
+    return cache.digest(path, kind, compute, st)
+
+def _size_mtime(st):
+    # os.stat_result is itself a tuple subclass, so test for it first
+    if isinstance(st, os.stat_result):
+        return st.st_size, st.st_mtime_ns
+    return tuple(st)
+
+class Snapshot:
+    """
+    One walk of a directory tree: the listing of every directory plus size
+    and mtime of every file, taken with a single scandir pass.
+
+    Tools accept a Snapshot in place of walking the tree themselves, so a
+    traverse -> compare -> move workflow costs one walk. Relative paths use
+    '/' separators.
+
+    Symlinked directories are recorded and followed, as traverse_directory
+    does; walk() lists but does not descend into them, as os.walk does.
+    Every other entry (including broken symlinks) is recorded as a file, as
+    both of them list it. The one difference: a symlink leading back to one
+    of its own ancestors is recorded as an unreadable directory (ELOOP)
+    instead of being followed until the path gets too long.
+    """
+
+    def __init__(self, top):
+        self.top = os.path.abspath(top)
+        # rel_dir -> (sorted subdirectory names, sorted file names)
+        self.children = {}
+        # rel_path -> (size, mtime_ns)
+        self.files = {}
+        # rel_dir -> error description for directories that could not be listed
+        self.errors = {}
+        # rel_dirs that are symlinks to directories
+        self.links = set()
+
+    def abs_path(self, rel_path):
+        """Absolute path of a '/'-separated path relative to the snapshot root"""
+        if not rel_path:
+            return self.top
+        return os.path.join(self.top, rel_path.replace('/', os.sep))
+
+    def rel_path(self, path):
+        """Relative '/'-separated path of an absolute path, or None if it is outside the snapshot"""
+        rel = os.path.relpath(os.path.abspath(path), self.top)
+        if rel == os.curdir:
+            return ''
+        if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+            return None
+        return rel.replace(os.sep, '/')
+
+    def listdir(self, rel_dir=''):
+        """
+        List a directory like traverse_directory does: directories first,
+        then files, each sorted case-insensitively.
+
+        Returns:
+            list: (name, is_dir) tuples; raises the recorded error for unreadable directories
+        """
+        if rel_dir in self.errors:
+            raise self.errors[rel_dir]
+        dirs, files = self.children[rel_dir]
+        return [(name, True) for name in dirs] + [(name, False) for name in files]
+
+    def walk(self, file_filter=None):
+        """
+        Yield (abs_root, dirs, files) like FileFilter.walk, from the snapshot
+        instead of the disk. As with os.walk, removing names from dirs stops
+        the walk from descending into them.
+        """
+        pending = ['']
+        while pending:
+            rel_dir = pending.pop()
+            dirs, files = self.children[rel_dir]
+            if file_filter is None:
+                dirs, files = list(dirs), list(files)
+            else:
+                dirs = [name for name in dirs if file_filter.dir_allowed(name, _join(rel_dir, name))]
+                files = [name for name in files
+                         if file_filter.matches(name, _join(rel_dir, name), self.abs_path(_join(rel_dir, name)))]
+            yield self.abs_path(rel_dir), dirs, files
+            # Like os.walk, symlinked directories are listed but not descended into
+            pending.extend(rel for rel in (_join(rel_dir, name) for name in reversed(dirs))
+                           if rel not in self.links)
+
+    def iter_files(self):
+        """Yield (rel_path, size, mtime_ns) for every file"""
+        for rel_path, (size, mtime_ns) in self.files.items():
+            yield rel_path, size, mtime_ns
+
+    def exists(self, path):
+        """
+        Existence check that answers from the snapshot for recorded paths.
+
+        Paths not in the snapshot (outside it, filtered out or created since)
+        are checked on the filesystem, so a stale or filtered snapshot never
+        reports an existing file as missing.
+        """
+        rel = self.rel_path(path)
+        if rel is not None and (rel in self.files or rel in self.children):
+            return True
+        return os.path.exists(path)
+
+    def stat(self, rel_path):
+        """(size, mtime_ns) of a file in the snapshot"""
+        return self.files[rel_path]
+
+    def path_trie(self, file_filter=None):
+        """Relative paths of all files (passing file_filter, if given) as a PathTrie, as FileFilter.walk sees them"""
+        trie = PathTrie()
+        for root, dirs, files in self.walk(file_filter):
+            trie.add_many(self.rel_path(root), files)
+        return trie
+
+    def digest(self, rel_path, kind, compute, cache=None):
+        """Digest of a file through the stat cache (if enabled), using the snapshot's stat instead of a new one"""
+        if cache is None:
+            return cached_digest(self.abs_path(rel_path), kind, compute, self.files[rel_path])
+        return cache.digest(self.abs_path(rel_path), kind, compute, self.files[rel_path])
+
+    def forget(self, path):
+        """Remove a file from the snapshot (and the cache), e.g. after moving it away"""
+        rel = self.rel_path(path)
+        if rel is None or rel not in self.files:
+            return
+        del self.files[rel]
+        parent, _, name = rel.rpartition('/')
+        dirs, files = self.children[parent]
+        files.remove(name)
+        if _default_cache is not None:
+            _default_cache.forget(path)
+
+    def add_file(self, path):
+        """Record a file created inside the snapshot root (e.g. the destination of a move)"""
+        rel = self.rel_path(path)
+        if not rel:
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        parent, _, name = rel.rpartition('/')
+        # Register any new parent directories first
+        components = parent.split('/') if parent else []
+        for i, component in enumerate(components):
+            rel_dir = '/'.join(components[:i + 1])
+            if rel_dir not in self.children:
+                self.children[rel_dir] = ([], [])
+                _insert_sorted(self.children['/'.join(components[:i])][0], component)
+        if rel not in self.files:
+            _insert_sorted(self.children[parent][1], name)
+        self.files[rel] = (st.st_size, st.st_mtime_ns)
+
+    def save(self, snapshot_path):
+        """Write the snapshot to a JSON file (compressed when the name ends in .gz/.xz)"""
+        data = {
+            "version": CACHE_VERSION,
+            "top": self.top,
+            "children": self.children,
+            "files": self.files,
+            "errors": {rel: [e.errno, e.strerror, e.filename] for rel, e in self.errors.items()},
+            "links": sorted(self.links),
+        }
+        with open_manifest(snapshot_path, "w") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, snapshot_path):
+        """Read a snapshot written by save()"""
+        with open_manifest(snapshot_path) as f:
+            data = json.load(f)
+        snapshot = cls(data["top"])
+        snapshot.children = {rel: (dirs, files) for rel, (dirs, files) in data["children"].items()}
+        snapshot.files = {rel: tuple(value) for rel, value in data["files"].items()}
+        snapshot.errors = {rel: _error_from(errno_, strerror, filename)
+                           for rel, (errno_, strerror, filename) in data["errors"].items()}
+        snapshot.links = set(data.get("links", []))
+        return snapshot
+
+def _join(rel_dir, name):
+    return f"{rel_dir}/{name}" if rel_dir else name
+
+def _insert_sorted(names, name):
+    """Insert name into a listing kept sorted case-insensitively"""
+    names.append(name)
+    names.sort(key=str.lower)
+
+def _error_from(errno_, strerror, filename):
+    if errno_ in (1, 13):
+        return PermissionError(errno_, strerror, filename)
+    if errno_ == 2:
+        return FileNotFoundError(errno_, strerror, filename)
+    return OSError(errno_, strerror, filename)
+
+def take_snapshot(top, file_filter=None):
+    """
+    Walk a directory tree once with os.scandir and record every directory
+    listing and file stat. Symlinked directories are followed (loops back
+    to an ancestor are recorded as errors); see Snapshot.
+
+    Args:
+        top (str): Directory to walk
+        file_filter (FileFilter): Filter applied while walking; excluded directories are pruned (default: None)
+
+    Returns:
+        Snapshot: The snapshot
+    """
+    if file_filter is None:
+        file_filter = FileFilter()
+    snapshot = Snapshot(top)
+    pending = ['']
+
+    while pending:
+        rel_dir = pending.pop()
+        dirs = []
+        files = []
+        try:
+            with os.scandir(snapshot.abs_path(rel_dir)) as it:
+                for entry in it:
+                    rel_path = _join(rel_dir, entry.name)
+                    try:
+                        # Symlinked directories count as directories, as os.path.isdir says
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        # Prune excluded directories before descending into them
+                        if file_filter.dir_allowed(entry.name, rel_path):
+                            dirs.append(entry.name)
+                            if entry.is_symlink():
+                                snapshot.links.add(rel_path)
+                        continue
+                    if not file_filter.matches(entry.name, rel_path, entry.path):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        try:
+                            # Broken symlink: still listed, as os.walk and traverse_directory do
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                    files.append(entry.name)
+                    snapshot.files[rel_path] = (st.st_size, st.st_mtime_ns)
+        except OSError as e:
+            snapshot.errors[rel_dir] = e
+            snapshot.children[rel_dir] = ([], [])
+            continue
+
+        dirs.sort(key=str.lower)
+        files.sort(key=str.lower)
+        snapshot.children[rel_dir] = (dirs, files)
+        for name in reversed(dirs):
+            rel_path = _join(rel_dir, name)
+            if rel_path in snapshot.links and _is_link_loop(snapshot, rel_path):
+                # Following it would never end; list it as an unreadable directory instead
+                snapshot.errors[rel_path] = OSError(errno.ELOOP, os.strerror(errno.ELOOP), snapshot.abs_path(rel_path))
+                snapshot.children[rel_path] = ([], [])
+                continue
+            pending.append(rel_path)
+
+    return snapshot
+
+def _is_link_loop(snapshot, rel_path):
+    """True if a symlinked directory resolves to the snapshot root or one of its ancestors in the walk"""
+    target = os.path.realpath(snapshot.abs_path(rel_path))
+    components = rel_path.split('/')
+    return any(os.path.realpath(snapshot.abs_path('/'.join(components[:i]))) == target
+               for i in range(len(components)))
+
+def add_cache_argument(parser):
+    """Add the shared --cache option to an argparse parser"""
+    parser.add_argument("--cache", metavar="FILE", help="Digest cache file reused between runs (gzip/xz compressed if it ends in .gz/.xz)")
+
+def load_cache(cache_path):
+    """Enable the shared cache and load a saved cache file into it, if a path is given"""
+    if cache_path:
+        enable_cache().load(cache_path)
+
+def save_cache(cache_path):
+    """Save the shared cache to a file, if a path is given and the cache is enabled"""
+    if not cache_path or _default_cache is None:
+        return
+    try:
+        _default_cache.save(cache_path)
+    except Exception as e:
+        print(f"Error writing cache {cache_path}: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk a directory once and save a snapshot that directory_traversal.py, directory_compare.py, file_md5_scanner.py and move_md_with_images.py can reuse")
+    parser.add_argument("directory", help="Directory to snapshot")
+    parser.add_argument("--output", required=True, help="Snapshot file to write (gzip/xz compressed if it ends in .gz/.xz)")
+    add_filter_arguments(parser)
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: Directory '{args.directory}' does not exist.")
+        return
+
+    snapshot = take_snapshot(args.directory, filter_from_args(args))
+    for rel_dir, error in snapshot.errors.items():
+        print(f"Error listing {snapshot.abs_path(rel_dir)}: {error}")
+    try:
+        snapshot.save(args.output)
+    except Exception as e:
+        print(f"Error writing snapshot {args.output}: {e}")
+        return
+    print(f"Snapshot of {snapshot.top}: {len(snapshot.children)} directories, {len(snapshot.files)} files")
+    print(f"Written to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import os
+import re
+import gzip
+import lzma
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Compressed manifests are recognised by magic bytes when reading and by
+# extension when writing; anything else is plain UTF-8 text
+GZIP_MAGIC = b'\x1f\x8b'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'lzma': '.xz'}
+
+# Matches lines written by directory_traversal.traverse_directory:
+#   "  [DIR] folder/"
+#   "  [FILE] name (Digest: 0123abcd...)"
+#   "  [FILE] name"
+ENTRY_PATTERN = re.compile(r'^( *)\[(DIR|FILE)\] (.*?)(?: \(Digest: ([0-9a-fA-F]+)\))?$')
+
+# Full MD5 of a file whose sampled digest collided, appended after the tree:
+#   "[FULL] dir/name (Digest: 0123abcd...)"
+FULL_PATTERN = re.compile(r'^\[FULL\] (.*) \(Digest: ([0-9a-fA-F]+)\)$')
+
+# All tagged lines at once, for scanning a whole chunk of text with finditer.
+# The rest of the line is matched greedily and the digest suffix split off
+# afterwards, which avoids the backtracking a lazy match would cost per line.
+CHUNK_PATTERN = re.compile(r'^( *)\[(DIR|FILE|ROOT|SCHEME|FULL)\] ([^\r\n]*)', re.MULTILINE)
+DIGEST_SEPARATOR = ' (Digest: '
+
+# Chunks start at top-level directories, where the indentation stack is empty
+SPLIT_MARKER = b'\n[DIR] '
+
+DEFAULT_CHUNK_BYTES = 16 * 1024 * 1024
+
+NO_DIGEST = bytes(16)
+
+HEX_DIGEST = re.compile(r'[0-9a-fA-F]+$')
+
+def open_manifest(manifest_path, mode='r'):
+    """
+    Open a manifest as a text stream, transparently (de)compressing it.
+
+    Reading detects gzip and xz/lzma by magic bytes and decompresses line by
+    line; writing compresses when the path ends in .gz, .xz or .lzma.
+
+    Args:
+        manifest_path (str): Path to the manifest
+        mode (str): 'r' to read or 'w' to write (default: 'r')
+
+    Returns:
+        file object: Text stream (UTF-8)
+    """
+    if mode == 'r':
+        with open(manifest_path, 'rb') as f:
+            magic = f.read(len(XZ_MAGIC))
+        if magic.startswith(GZIP_MAGIC):
+            return gzip.open(manifest_path, 'rt', encoding='utf-8')
+        if magic.startswith(XZ_MAGIC):
+            return lzma.open(manifest_path, 'rt', encoding='utf-8')
+        return open(manifest_path, 'r', encoding='utf-8')
+
+    lower = manifest_path.lower()
+    if lower.endswith('.gz'):
+        return gzip.open(manifest_path, mode + 't', encoding='utf-8', compresslevel=6)
+    if lower.endswith(('.xz', '.lzma')):
+        return lzma.open(manifest_path, mode + 't', encoding='utf-8', preset=6)
+    return open(manifest_path, mode, encoding='utf-8')
+
+def iter_list_entries(manifest_path):
+    """
+    Stream the entries of a list.txt manifest, rebuilding relative paths from
+    the indentation.
+
+    Args:
+        manifest_path (str): Path to the list.txt file
+
+    Yields:
+        tuple: (kind, rel_path, name, digest) where kind is 'ROOT', 'SCHEME',
+               'DIR', 'FILE' or 'FULL'; for 'ROOT' rel_path is the absolute
+               root path, for 'SCHEME' it is the digest scheme description,
+               and name and digest are None for both; digest is None for files
+               without one; 'FULL' entries carry the full MD5 of a file
+               already listed as 'FILE'
+    """
+    root_seen = False
+    # Directory names for each depth level seen so far
+    stack = []
+
+    with open_manifest(manifest_path) as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if not root_seen and line.startswith('[ROOT] '):
+                root_seen = True
+                yield 'ROOT', line[7:].rstrip('/'), None, None
+                continue
+            if line.startswith('[SCHEME] '):
+                yield 'SCHEME', line[9:], None, None
+                continue
+            if line.startswith('[FULL] '):
+                match = FULL_PATTERN.match(line)
+                if match:
+                    rel_path, digest = match.groups()
+                    yield 'FULL', rel_path, rel_path.rpartition('/')[2], digest.lower()
+                continue
+            match = ENTRY_PATTERN.match(line)
+            if not match:
+                # Error lines and anything unknown are ignored
+                continue
+            indent, kind, name, digest = match.groups()
+            depth = len(indent) // 2
+            del stack[depth:]
+            if kind == 'DIR':
+                name = name.rstrip('/')
+                stack.append(name)
+                yield 'DIR', '/'.join(stack), name, None
+            else:
+                yield 'FILE', '/'.join(stack + [name]), name, digest.lower() if digest else None
+
+class ManifestChunk:
+    """
+    Entries parsed from one chunk of a list.txt manifest, in compact arrays.
+
+    dirs[0] is the chunk's top level (''), the other items are
+    '/'-separated directory paths relative to the manifest root. Entry i
+    (a directory or a file, in manifest order) is names[i] inside
+    dirs[parents[i]]; is_dir[i] is 1 for directories and digests holds 16
+    raw bytes per entry (all zero when there is no digest).
+    """
+
+    __slots__ = ('root', 'scheme', 'dirs', 'names', 'parents', 'is_dir', 'digests', 'full')
+
+    def __init__(self):
+        self.root = None
+        self.scheme = None
+        self.dirs = ['']
+        self.names = []
+        self.parents = array('I')
+        self.is_dir = bytearray()
+        self.digests = bytearray()
+        # (rel_path, hex digest) from "[FULL] ..." lines
+        self.full = []
+
+    def digest(self, i):
+        """Hex digest of entry i, or None"""
+        raw = self.digests[i * 16:i * 16 + 16]
+        return None if raw == NO_DIGEST else raw.hex()
+
+def parse_chunk_text(text):
+    """
+    Parse a chunk of list.txt text that starts at a top-level line.
+
+    Returns:
+        ManifestChunk: The parsed entries
+    """
+    chunk = ManifestChunk()
+    dirs = chunk.dirs
+    names = chunk.names
+    parents = chunk.parents
+    is_dir = chunk.is_dir
+    digests = chunk.digests
+    # Directory ids for each depth level seen so far
+    stack = [0]
+
+    for match in CHUNK_PATTERN.finditer(text):
+        indent, kind, name = match.groups()
+        digest = None
+        if name.endswith(')') and DIGEST_SEPARATOR in name:
+            head, _, tail = name.rpartition(DIGEST_SEPARATOR)
+            if HEX_DIGEST.match(tail, 0, len(tail) - 1):
+                name, digest = head, tail[:-1]
+        if kind == 'FILE' or kind == 'DIR':
+            depth = len(indent) // 2
+            del stack[depth + 1:]
+            parent = stack[-1]
+            if kind == 'DIR':
+                name = name.rstrip('/')
+                parent_path = dirs[parent]
+                stack.append(len(dirs))
+                dirs.append(f"{parent_path}/{name}" if parent_path else name)
+            names.append(name)
+            parents.append(parent)
+            is_dir.append(kind == 'DIR')
+            digests += bytes.fromhex(digest) if digest and len(digest) == 32 else NO_DIGEST
+        elif kind == 'ROOT':
+            if chunk.root is None:
+                chunk.root = name.rstrip('/')
+        elif kind == 'SCHEME':
+            chunk.scheme = name
+        elif digest:
+            chunk.full.append((name, digest.lower()))
+    return chunk
+
+def _parse_chunk_range(manifest_path, start, end):
+    with open(manifest_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return parse_chunk_text(data.decode('utf-8'))
+
+def find_split_offsets(manifest_path, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Find byte offsets that split an uncompressed manifest into chunks of
+    roughly chunk_bytes, each starting at a top-level "[DIR] " line.
+
+    Returns:
+        list: Increasing offsets, starting with 0 and ending with the file size
+    """
+    size = os.path.getsize(manifest_path)
+    offsets = [0]
+    with open(manifest_path, 'rb') as f:
+        target = chunk_bytes
+        while target < size:
+            f.seek(target)
+            block_start = target
+            found = -1
+            while found < 0:
+                block = f.read(1024 * 1024 + len(SPLIT_MARKER))
+                found = block.find(SPLIT_MARKER)
+                if found < 0:
+                    if len(block) <= 1024 * 1024:
+                        # Reached the end of the file without another top-level directory
+                        break
+                    # Overlap consecutive blocks so a marker spanning them is not missed
+                    block_start += len(block) - len(SPLIT_MARKER)
+                    f.seek(block_start)
+            if found < 0:
+                break
+            offset = block_start + found + 1
+            offsets.append(offset)
+            target = offset + chunk_bytes
+    offsets.append(size)
+    return offsets
+
+def _iter_text_chunks(manifest_path, chunk_bytes):
+    """Split a (compressed) manifest stream into text chunks at top-level "[DIR] " lines"""
+    batch = []
+    batch_size = 0
+    with open_manifest(manifest_path) as f:
+        for line in f:
+            if batch_size >= chunk_bytes and line.startswith('[DIR] '):
+                yield ''.join(batch)
+                batch = []
+                batch_size = 0
+            batch.append(line)
+            batch_size += len(line)
+    if batch:
+        yield ''.join(batch)
+
+def parse_list_chunks(manifest_path, workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Parse a list.txt manifest in parallel, split at top-level directories.
+
+    Plain manifests are split by byte offset and each worker process reads
+    its own range; compressed manifests are decompressed once here and the
+    text chunks are handed to the workers. Small manifests are parsed
+    in-process.
+
+    Args:
+        manifest_path (str): Path to the (possibly compressed) list.txt file
+        workers (int): Number of worker processes (default: CPU count)
+        chunk_bytes (int): Approximate chunk size in bytes (default: 16MB)
+
+    Returns:
+        list: ManifestChunk objects in manifest order
+    """
+    with open(manifest_path, 'rb') as f:
+        magic = f.read(len(XZ_MAGIC))
+    compressed = magic.startswith(GZIP_MAGIC) or magic.startswith(XZ_MAGIC)
+    workers = workers or os.cpu_count() or 1
+
+    if not compressed:
+        offsets = find_split_offsets(manifest_path, chunk_bytes)
+        if len(offsets) <= 2 or workers == 1:
+            return [_parse_chunk_range(manifest_path, offsets[0], offsets[-1])]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            n = len(offsets) - 1
+            return list(executor.map(_parse_chunk_range, [manifest_path] * n, offsets[:-1], offsets[1:]))
+
+    if workers == 1:
+        return [parse_chunk_text(text) for text in _iter_text_chunks(manifest_path, chunk_bytes)]
+    chunks = []
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Keep only a few decompressed chunks in flight instead of the whole manifest
+        max_pending = 2 * workers
+        for text in _iter_text_chunks(manifest_path, chunk_bytes):
+            pending.append(executor.submit(parse_chunk_text, text))
+            if len(pending) >= max_pending:
+                chunks.append(pending.popleft().result())
+        while pending:
+            chunks.append(pending.popleft().result())
+    return chunks
@@ -0,0 +1,242 @@
+import os
+import json
+import bisect
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from list_manifest import iter_list_entries
+
+class ManifestIndex:
+    """
+    In-memory indexes over a list.txt manifest: by digest, by file name and
+    by sorted relative path (for prefix lookups).
+    """
+
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self.root = None
+        self.scheme = None
+        self.by_digest = {}
+        self.by_name = {}
+        self.paths = []
+        # (size, mtime_ns) of the loaded manifest, and of the last poll that saw a change
+        self.signature = None
+        self.pending_signature = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        """
+        (Re)load the manifest from disk and swap in the new indexes.
+
+        Returns:
+            int: Number of entries loaded
+        """
+        signature = manifest_signature(self.manifest_path)
+        root, scheme, by_digest, by_name, paths = build_indexes(self.manifest_path)
+        with self.lock:
+            self.root = root
+            self.scheme = scheme
+            self.by_digest = by_digest
+            self.by_name = by_name
+            self.paths = paths
+            self.signature = signature
+        self.pending_signature = None
+        return len(paths)
+
+    def reload_if_changed(self):
+        """
+        Reload the manifest once a change has settled.
+
+        directory_traversal.py writes list.txt in place over the whole run,
+        so a changed size/mtime is only acted on when it is the same on two
+        consecutive polls; a manifest still being written is never loaded.
+
+        Returns:
+            bool: True if the manifest was reloaded
+        """
+        try:
+            signature = manifest_signature(self.manifest_path)
+        except OSError:
+            return False
+        if signature == self.signature:
+            self.pending_signature = None
+            return False
+        if signature != self.pending_signature:
+            self.pending_signature = signature
+            return False
+        self.load()
+        return True
+
+    def lookup(self, digests=(), names=(), prefixes=(), limit=1000):
+        """
+        Answer a batch of lookups against the current indexes.
+
+        Args:
+            digests (iterable): Digests to look up
+            names (iterable): File names to look up
+            prefixes (iterable): Relative path prefixes to look up
+            limit (int): Maximum number of paths returned per prefix
+
+        Returns:
+            dict: {"digests": {d: [paths]}, "names": {n: [paths]}, "prefixes": {p: [paths]}}
+        """
+        with self.lock:
+            by_digest = self.by_digest
+            by_name = self.by_name
+            paths = self.paths
+        result = {
+            "digests": {d: by_digest.get(d.lower(), []) for d in digests},
+            "names": {n: by_name.get(n, []) for n in names},
+            "prefixes": {},
+        }
+        for prefix in prefixes:
+            start = bisect.bisect_left(paths, prefix)
+            matches = []
+            for path in paths[start:start + limit]:
+                if not path.startswith(prefix):
+                    break
+                matches.append(path)
+            result["prefixes"][prefix] = matches
+        return result
+
+def manifest_signature(manifest_path):
+    """(size, mtime_ns) of the manifest file, used to detect changes"""
+    st = os.stat(manifest_path)
+    return st.st_size, st.st_mtime_ns
+
+def build_indexes(manifest_path):
+    """
+    Parse a list.txt manifest and build lookup indexes.
+
+    Args:
+        manifest_path (str): Path to the list.txt file
+
+    Returns:
+        tuple: (root, scheme, by_digest, by_name, sorted_paths); scheme is None
+               for a manifest written with the legacy digest
+    """
+    root = None
+    scheme = None
+    by_digest = {}
+    by_name = {}
+    paths = []
+
+    for kind, rel_path, name, digest in iter_list_entries(manifest_path):
+        if kind == 'ROOT':
+            root = rel_path
+        elif kind == 'SCHEME':
+            scheme = rel_path
+        elif kind == 'FILE':
+            paths.append(rel_path)
+            by_name.setdefault(name, []).append(rel_path)
+            if digest:
+                by_digest.setdefault(digest, []).append(rel_path)
+        elif kind == 'FULL':
+            # Full MD5s of files whose sampled digests collided are searchable too
+            by_digest.setdefault(digest, []).append(rel_path)
+
+    paths.sort()
+    return root, scheme, by_digest, by_name, paths
+
+def watch_manifest(index, interval, stop_event):
+    """Poll the manifest file and hot-reload the index when it changes"""
+    while not stop_event.wait(interval):
+        try:
+            if index.reload_if_changed():
+                print(f"Reloaded manifest: {index.manifest_path} ({len(index.paths)} entries)")
+        except Exception as e:
+            print(f"Error reloading manifest {index.manifest_path}: {e}")
+
+def make_handler(index):
+    """Create a request handler class bound to the given index"""
+
+    class ManifestQueryHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/status":
+                self._send_json(200, {
+                    "manifest": index.manifest_path,
+                    "root": index.root,
+                    "scheme": index.scheme or "legacy",
+                    "entries": len(index.paths),
+                    "mtime": index.signature[1] / 1e9 if index.signature else None,
+                })
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/lookup":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                result = index.lookup(
+                    digests=request.get("digests", []),
+                    names=request.get("names", []),
+                    prefixes=request.get("prefixes", []),
+                    limit=int(request.get("limit", 1000)),
+                )
+            except (ValueError, AttributeError, TypeError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            self._send_json(200, result)
+
+        def log_message(self, format, *args):
+            # Keep lookups quiet; errors are still reported through send_error
+            pass
+
+    return ManifestQueryHandler
+
+def serve(manifest_path, host="127.0.0.1", port=8765, reload_interval=2.0):
+    """
+    Load a manifest and serve batched lookups over HTTP until interrupted.
+
+    Args:
+        manifest_path (str): Path to the list.txt file
+        host (str): Address to bind
+        port (int): Port to bind
+        reload_interval (float): Seconds between manifest change checks
+    """
+    index = ManifestIndex(manifest_path)
+    count = index.load()
+    print(f"Loaded {count} entries from {manifest_path}")
+
+    stop_event = threading.Event()
+    watcher = threading.Thread(target=watch_manifest, args=(index, reload_interval, stop_event), daemon=True)
+    watcher.start()
+
+    server = ThreadingHTTPServer((host, port), make_handler(index))
+    print(f"Serving manifest lookups on http://{host}:{server.server_address[1]}/lookup")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve indexed lookups over a list.txt manifest written by directory_traversal.py")
+    parser.add_argument("manifest", help="Path to the list.txt manifest")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind (default: 8765)")
+    parser.add_argument("--reload-interval", type=float, default=2.0, help="Seconds between manifest change checks (default: 2)")
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.manifest):
+        print(f"Error: File '{args.manifest}' does not exist.")
+        return
+
+    serve(args.manifest, args.host, args.port, args.reload_interval)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import os
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from list_manifest import iter_list_entries, open_manifest
+from directory_traversal import DigestScheme
+from file_md5_scanner import calculate_md5, hash_archive_members
+from bulk_io import Throttle, add_io_arguments
+
+# Exit codes, so cron jobs can tell "backup damaged" from "could not run"
+EXIT_OK = 0
+EXIT_MISMATCH = 1
+EXIT_ERROR = 2
+
+def detect_manifest_format(manifest_path):
+    """Return 'list' for list.txt manifests and 'scan' for saved file_md5_scanner output"""
+    with open_manifest(manifest_path) as f:
+        for line in f:
+            if line.strip():
+                return 'list' if line.startswith('[ROOT] ') else 'scan'
+    return 'scan'
+
+def load_list_manifest(manifest_path):
+    """
+    Read a list.txt manifest.
+
+    Returns:
+        tuple: (root, entries, scheme) where entries are (rel_path, digest, size, method)
+    """
+    root = None
+    scheme_text = None
+    entries = []
+    for kind, rel_path, name, digest in iter_list_entries(manifest_path):
+        if kind == 'ROOT':
+            root = rel_path
+        elif kind == 'SCHEME':
+            scheme_text = rel_path
+        elif kind == 'FILE':
+            entries.append((rel_path, digest, None, 'sampled'))
+        elif kind == 'FULL':
+            entries.append((rel_path, digest, None, 'md5'))
+    return root, entries, DigestScheme.parse(scheme_text)
+
+def load_scan_manifest(manifest_path):
+    """
+    Read saved file_md5_scanner output ("path | md5 [| size]" or
+    "path | fingerprint | N members" lines).
+
+    Older output recorded the directory (and the paths) as typed; relative
+    ones are resolved against the manifest's location.
+
+    Returns:
+        tuple: (root, entries) where entries are (rel_path, digest, size, method)
+    """
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    root = None
+    entries = []
+    with open_manifest(manifest_path) as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line.startswith('Scanning directory: '):
+                root = os.path.join(manifest_dir, line[len('Scanning directory: '):])
+                continue
+            # Member listings from --verbose are indented; only archives themselves are verified
+            if not line or line.startswith(' '):
+                continue
+            parts = line.split(' | ')
+            if len(parts) < 2 or len(parts[1]) != 32:
+                continue
+            path, digest = parts[0], parts[1].lower()
+            size = None
+            method = 'md5'
+            if len(parts) > 2:
+                if parts[2].endswith(' members'):
+                    method = 'members'
+                elif parts[2].isdigit():
+                    size = int(parts[2])
+            path = os.path.join(manifest_dir, path)
+            if root and is_within(path, root):
+                path = os.path.relpath(path, root)
+            entries.append((path, digest, size, method))
+    return root, entries
+
+def is_within(path, root):
+    """True if path is root or inside it, comparing whole path components ('/data' does not contain '/data2/x')"""
+    path = os.path.normpath(path)
+    root = os.path.normpath(root)
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+def rehash(full_path, method, io_mode, throttle, scheme=None):
+    """Recompute the digest of a file the same way the manifest was produced"""
+    if method == 'sampled':
+        return scheme.digest(full_path, io_mode, throttle)
+    if method == 'members':
+        return hash_archive_members(full_path)[1]
+    return calculate_md5(full_path, io_mode, throttle)
+
+def report(status, path, detail=""):
+    """Print one verification problem immediately, so output can be streamed"""
+    print(f"{status} {path}{' ' + detail if detail else ''}", flush=True)
+
+def verify_manifest(manifest_path, root=None, workers=4, fail_fast=False, io_mode='buffered', throttle=None):
+    """
+    Verify files on disk against a manifest.
+
+    Missing files and size mismatches are found with stat only, before any
+    file is read; the remaining files are re-hashed in parallel and every
+    mismatch is reported as soon as it is found. list.txt manifests carry no
+    sizes, so for them the stat phase only finds missing files. An entry for
+    the manifest file itself (older list.txt files list themselves, half
+    written) is skipped.
+
+    Args:
+        manifest_path (str): list.txt or saved file_md5_scanner output
+        root (str): Directory to verify, overriding the root recorded in the manifest (default: None)
+        workers (int): Number of parallel hashing threads (default: 4)
+        fail_fast (bool): Stop at the first problem (default: False)
+        io_mode (str): I/O mode for re-hashing, see bulk_io.IO_MODES (default: 'buffered')
+        throttle (Throttle): Optional bytes/s limit for re-hashing (default: None)
+
+    Returns:
+        tuple: (checked, problems) where checked counts the entries actually
+               checked (fewer than all entries when fail_fast stopped early)
+    """
+    scheme = None
+    if detect_manifest_format(manifest_path) == 'list':
+        manifest_root, entries, scheme = load_list_manifest(manifest_path)
+    else:
+        manifest_root, entries = load_scan_manifest(manifest_path)
+
+    manifest_file = os.path.abspath(manifest_path)
+    root = root or manifest_root or os.path.dirname(manifest_file)
+    problems = 0
+    checked = 0
+
+    # Phase 1: stat only
+    to_hash = []
+    for rel_path, digest, size, method in entries:
+        full_path = os.path.join(root, rel_path)
+        if os.path.abspath(full_path) == manifest_file:
+            continue
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            report("MISSING", full_path)
+            problems += 1
+            checked += 1
+            if fail_fast:
+                return checked, problems
+            continue
+        if size is not None and st.st_size != size:
+            report("SIZE", full_path, f"(expected {size}, found {st.st_size})")
+            problems += 1
+            checked += 1
+            if fail_fast:
+                return checked, problems
+            continue
+        if digest:
+            # Counted as checked once its hash has been compared
+            to_hash.append((full_path, digest, method))
+        else:
+            checked += 1
+
+    # Phase 2: parallel re-hash of everything that passed the stat checks, with a
+    # bounded number of hashes in flight so huge manifests do not create a Future per entry
+    max_pending = 4 * workers
+    pending = {}
+    queued = iter(to_hash)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            for full_path, digest, method in queued:
+                pending[executor.submit(rehash, full_path, method, io_mode, throttle, scheme)] = (full_path, digest)
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                full_path, digest = pending.pop(future)
+                actual = future.result()
+                checked += 1
+                if actual is None:
+                    report("UNREADABLE", full_path)
+                elif actual != digest:
+                    report("MISMATCH", full_path, f"(expected {digest}, found {actual})")
+                else:
+                    continue
+                problems += 1
+                if fail_fast:
+                    for other in pending:
+                        other.cancel()
+                    return checked, problems
+
+    return checked, problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify files on disk against a list.txt manifest or saved file_md5_scanner output")
+    parser.add_argument("manifest", help="Path to list.txt or saved file_md5_scanner output")
+    parser.add_argument("--root", help="Directory to verify instead of the root recorded in the manifest (e.g. the backup target)")
+    parser.add_argument("--workers", type=int, default=4, help="Number of parallel hashing threads (default: 4)")
+    parser.add_argument("--fail-fast", action="store_true", help="Stop at the first missing, changed or unreadable file")
+    add_io_arguments(parser)
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.manifest):
+        print(f"Error: File '{args.manifest}' does not exist.")
+        sys.exit(EXIT_ERROR)
+
+    throttle = Throttle(args.throttle) if args.throttle else None
+    try:
+        checked, problems = verify_manifest(args.manifest, args.root, args.workers, args.fail_fast, args.io_mode, throttle)
+    except Exception as e:
+        print(f"Error verifying manifest {args.manifest}: {e}")
+        sys.exit(EXIT_ERROR)
+
+    print(f"Checked {checked} files, {problems} problems")
+    sys.exit(EXIT_MISMATCH if problems else EXIT_OK)
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import re
 import shutil
 import argparse
 from pathlib import Path
+from fs_core import Snapshot
 
 def find_image_references(md_file_path):
     """
@@ -43,14 +44,16 @@ def find_image_references(md_file_path):
     
     return image_paths
 
-def resolve_image_paths(md_file_path, image_references):
+def resolve_image_paths(md_file_path, image_references, snapshot=None):
     """
     Resolve relative image paths to absolute paths
+    Existence is answered from the snapshot when one is given
     Returns a tuple of (existing_image_paths, missing_image_references)
     """
     md_dir = Path(md_file_path).parent
     existing_image_paths = []
     missing_image_references = []
+    exists = snapshot.exists if snapshot is not None else os.path.exists
     
     for img_ref in image_references:
         # Convert to Path object
@@ -58,24 +61,26 @@ def resolve_image_paths(md_file_path, image_references):
         
         # If it's an absolute path, use as is
         if img_path.is_absolute():
-            if img_path.exists():
+            if exists(img_path):
                 existing_image_paths.append(img_path)
             else:
                 missing_image_references.append(img_ref)
         else:
             # It's a relative path, resolve relative to the Markdown file location
             resolved_path = (md_dir / img_path).resolve()
-            if resolved_path.exists():
+            if exists(resolved_path):
                 existing_image_paths.append(resolved_path)
             else:
                 missing_image_references.append(img_ref)
     
     return existing_image_paths, missing_image_references
 
-def move_md_with_images(source_md_path, destination_dir):
+def move_md_with_images(source_md_path, destination_dir, snapshot=None):
     """
     Move a Markdown file and all its referenced images to a new location
     This function MOVES files (removes from original location) rather than copying them
+    An optional Snapshot answers image existence checks and is updated after each move
+    (sources removed, destinations inside its root added)
     """
     # Check if source Markdown file exists
     if not os.path.exists(source_md_path):
@@ -92,7 +97,7 @@ def move_md_with_images(source_md_path, destination_dir):
     
     # Resolve image paths to absolute paths
     print("Resolving image paths...")
-    absolute_image_paths, missing_images = resolve_image_paths(source_md_path, image_references)
+    absolute_image_paths, missing_images = resolve_image_paths(source_md_path, image_references, snapshot)
     print(f"Found {len(absolute_image_paths)} existing image files")
     
     # Output missing image references
@@ -122,6 +127,9 @@ def move_md_with_images(source_md_path, destination_dir):
             
             # Move the image (remove from original location)
             shutil.move(str(img_path), str(dest_img_path))
+            if snapshot is not None:
+                snapshot.forget(img_path)
+                snapshot.add_file(dest_img_path)
             moved_images.append((img_path, dest_img_path))
             print(f"Moved image: {img_path} -> {dest_img_path}")
         except Exception as e:
@@ -142,6 +150,9 @@ def move_md_with_images(source_md_path, destination_dir):
     
     try:
         shutil.move(source_md_path, dest_md_path)
+        if snapshot is not None:
+            snapshot.forget(source_md_path)
+            snapshot.add_file(dest_md_path)
         print(f"Moved Markdown file: {source_md_path} -> {dest_md_path}")
     except Exception as e:
         print(f"Error moving Markdown file: {e}")
@@ -158,11 +169,15 @@ def main():
     parser = argparse.ArgumentParser(description="Move a Markdown file and its referenced images to a new location")
     parser.add_argument("source_md", help="Path to the source Markdown file")
     parser.add_argument("destination_dir", help="Destination directory path")
+    parser.add_argument("--snapshot", help="Snapshot file saved by fs_core.py to check image existence against; updated after the move")
     
     args = parser.parse_args()
     
     try:
-        move_md_with_images(args.source_md, args.destination_dir)
+        snapshot = Snapshot.load(args.snapshot) if args.snapshot else None
+        move_md_with_images(args.source_md, args.destination_dir, snapshot)
+        if snapshot is not None:
+            snapshot.save(args.snapshot)
     except Exception as e:
         print(f"Error: {e}")
 
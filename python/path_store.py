@@ -0,0 +1,182 @@
+import os
+import sys
+from collections.abc import Mapping
+
+# Key marking "this directory path is itself a stored entry"; path components are never empty
+_TERMINAL = ''
+
+# Returned by dict.get for absent components
+_MISSING = object()
+
+# Shared value for leaf entries, so a stored file costs one dict slot and no extra object
+_LEAF = None
+
+class PathTrie:
+    """
+    Set of '/'-separated relative paths stored as a trie of interned path
+    components.
+
+    Shared directory prefixes are stored once, and component strings are
+    interned so identical names in different trees (or different branches)
+    share one object. Supports membership tests, iteration and set
+    difference without materialising full path strings.
+    """
+
+    def __init__(self, paths=()):
+        self.root = {}
+        self.count = 0
+        for path in paths:
+            self.add(path)
+
+    def _node_for_dir(self, components):
+        """Return the child dict for a directory, creating it (and its parents) if needed"""
+        node = self.root
+        for component in components:
+            child = node.get(component, _MISSING)
+            if child is _MISSING:
+                child = node[sys.intern(component)] = {}
+            elif child is _LEAF:
+                # Entry stored as a leaf now also has children
+                child = node[component] = {_TERMINAL: True}
+            node = child
+        return node
+
+    def _add_to_node(self, node, name):
+        """Add a leaf under node; return True if it was not present"""
+        existing = node.get(name, _MISSING)
+        if existing is _MISSING:
+            node[sys.intern(name)] = _LEAF
+        elif existing is _LEAF or _TERMINAL in existing:
+            return False
+        else:
+            existing[_TERMINAL] = True
+        self.count += 1
+        return True
+
+    def add(self, path):
+        """Add a '/'-separated relative path"""
+        components = path.split('/')
+        return self._add_to_node(self._node_for_dir(components[:-1]), components[-1])
+
+    def add_many(self, dir_path, names):
+        """
+        Add several entries of one directory, walking to the directory only once.
+
+        Args:
+            dir_path (str): '/'-separated directory relative to the tree root ('' or '.' for the root)
+            names (iterable): Entry names inside dir_path
+        """
+        components = [] if dir_path in ('', '.') else dir_path.split('/')
+        node = self._node_for_dir(components)
+        for name in names:
+            self._add_to_node(node, name)
+
+    def __contains__(self, path):
+        node = self.root
+        components = path.split('/')
+        for component in components[:-1]:
+            node = node.get(component)
+            if not node:
+                return False
+        if components[-1] not in node:
+            return False
+        child = node[components[-1]]
+        return child is _LEAF or _TERMINAL in child
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self.iter_paths()
+
+    def iter_paths(self, sep='/'):
+        """Yield every stored path, joined with sep"""
+        return _iter_node(self.root, '', sep)
+
+    def difference(self, other, sep='/'):
+        """
+        Yield paths stored in this trie but not in other.
+
+        Whole subtrees that are absent from other are emitted without
+        descending into other at all.
+        """
+        return _diff_nodes(self.root, other.root, '', sep)
+
+def _iter_node(node, prefix, sep):
+    for name, child in node.items():
+        if name == _TERMINAL:
+            continue
+        path = prefix + name
+        if child is _LEAF:
+            yield path
+        else:
+            if _TERMINAL in child:
+                yield path
+            yield from _iter_node(child, path + sep, sep)
+
+def _diff_nodes(node_a, node_b, prefix, sep):
+    for name, child_a in node_a.items():
+        if name == _TERMINAL:
+            continue
+        path = prefix + name
+        child_b = node_b.get(name, _MISSING) if node_b else _MISSING
+        if child_b is _MISSING:
+            # Missing from the other tree entirely
+            if child_a is _LEAF:
+                yield path
+            else:
+                if _TERMINAL in child_a:
+                    yield path
+                yield from _iter_node(child_a, path + sep, sep)
+            continue
+        if child_a is _LEAF:
+            if child_b is not _LEAF and _TERMINAL not in child_b:
+                yield path
+            continue
+        if _TERMINAL in child_a and child_b is not _LEAF and _TERMINAL not in child_b:
+            yield path
+        yield from _diff_nodes(child_a, child_b if child_b is not _LEAF else None, path + sep, sep)
+
+class NamedPathIndex(Mapping):
+    """
+    Mapping from entry name to full path, storing each parent directory once.
+
+    Every entry costs one dict slot (name -> directory number);
+    full path strings are only built when a value is looked up.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.dirs = []
+        self.dir_ids = {}
+        self.entries = {}
+
+    def dir_id(self, rel_dir):
+        """Return the number of a '/'-separated directory relative to root, registering it if new"""
+        dir_id = self.dir_ids.get(rel_dir)
+        if dir_id is None:
+            dir_id = self.dir_ids[rel_dir] = len(self.dirs)
+            self.dirs.append(rel_dir)
+        return dir_id
+
+    def add(self, name, dir_id):
+        """Record an entry; a later entry with the same name replaces the earlier one"""
+        self.entries[name] = dir_id
+
+    def __getitem__(self, name):
+        rel_dir = self.dirs[self.entries[name]]
+        if rel_dir:
+            return os.path.join(str(self.root), rel_dir.replace('/', os.sep), name)
+        return os.path.join(str(self.root), name)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def keys(self):
+        return self.entries.keys()